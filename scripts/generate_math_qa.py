@@ -1,28 +1,34 @@
-from openai import OpenAI
-import json
+from openai import AsyncOpenAI, OpenAI, APITimeoutError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import argparse
+import asyncio
+import orjson
+import sys
 from dotenv import load_dotenv
 import os
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm.batch import collect_batch, submit_batch
+
 load_dotenv()
 
-def generate_math_problems():
-    """Generate a diverse set of math problems using GPT-4."""
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
-    categories = [
-        "Calculus (derivatives, integrals, limits)",
-        "Algebra (equations, inequalities, functions)",
-        "Trigonometry (identities, equations)",
-        "Linear Algebra (matrices, vectors)",
-        "Statistics (probability, distributions)",
-        "Number Theory (primes, divisibility)",
-        "Geometry (shapes, proofs)",
-    ]
-    
-    problems = []
-    
-    for category in categories:
-        prompt = f"""Generate 5 math problems in {category} with these requirements:
+# Bound concurrent requests so a full run stays under the account's TPM limit
+MAX_CONCURRENT_REQUESTS = 7
+
+CATEGORIES = [
+    "Calculus (derivatives, integrals, limits)",
+    "Algebra (equations, inequalities, functions)",
+    "Trigonometry (identities, equations)",
+    "Linear Algebra (matrices, vectors)",
+    "Statistics (probability, distributions)",
+    "Number Theory (primes, divisibility)",
+    "Geometry (shapes, proofs)",
+]
+
+def build_prompt(category: str) -> str:
+    """Build the generation prompt for a single category."""
+    return f"""Generate 5 math problems in {category} with these requirements:
 1. Varying difficulty levels (2 easy, 2 medium, 1 hard)
 2. Clear problem statements
 3. Detailed step-by-step solutions
@@ -38,32 +44,101 @@ Format each problem as a JSON object with:
 }}
 
 Return ONLY a JSON array of 5 problems, nothing else. Start with [ and end with ]."""
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert math professor creating practice problems. Always return valid JSON arrays."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
+
+def build_request_body(category: str) -> dict:
+    """Build the chat completion request body for a single category."""
+    return {
+        "model": "gpt-4",
+        "messages": [
+            {"role": "system", "content": "You are an expert math professor creating practice problems. Always return valid JSON arrays."},
+            {"role": "user", "content": build_prompt(category)}
+        ],
+        "temperature": 0.7
+    }
+
+def parse_category_problems(category: str, content: str) -> list:
+    """Parse the JSON array of problems returned for a category."""
+    try:
+        category_problems = orjson.loads(content)
+        print(f"✅ Generated {len(category_problems)} problems for {category}")
+        return category_problems
+    except Exception as e:
+        print(f"❌ Error generating problems for {category}: {e}")
+        print(f"Response was: {content[:200]}...")
+        return []
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APITimeoutError)),
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    reraise=True
+)
+async def _create_completion(client: AsyncOpenAI, category: str):
+    """Call GPT-4, backing off exponentially on rate limits and timeouts."""
+    return await client.chat.completions.create(**build_request_body(category))
+
+async def generate_category(client: AsyncOpenAI, semaphore: asyncio.Semaphore, category: str) -> list:
+    """Generate the problems for a single category."""
+    async with semaphore:
         try:
-            # Parse the JSON response
-            category_problems = json.loads(response.choices[0].message.content)
-            problems.extend(category_problems)
-            print(f"✅ Generated {len(category_problems)} problems for {category}")
+            response = await _create_completion(client, category)
         except Exception as e:
             print(f"❌ Error generating problems for {category}: {e}")
-            print(f"Response was: {response.choices[0].message.content[:200]}...")
-    
+            return []
+
+    return parse_category_problems(category, response.choices[0].message.content)
+
+async def generate_math_problems_async() -> list:
+    """Generate problems for every category concurrently."""
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    # gather preserves category order in the results
+    results = await asyncio.gather(
+        *(generate_category(client, semaphore, category) for category in CATEGORIES)
+    )
+    return [problem for category_problems in results for problem in category_problems]
+
+def generate_math_problems_batch() -> list:
+    """
+    Generate problems for every category through the OpenAI Batch API.
+
+    Batch jobs are billed at half the real-time price but may take up to
+    24 hours to complete, so this blocks while polling the job status.
+    """
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    # One request per category, keyed by the category name
+    bodies = {category: build_request_body(category) for category in CATEGORIES}
+    contents = collect_batch(client, submit_batch(client, bodies, "math_qa_batch.jsonl"))
+
+    problems = []
+    for category in CATEGORIES:
+        if category in contents:
+            problems.extend(parse_category_problems(category, contents[category]))
+    return problems
+
+def generate_math_problems(use_batch: bool = False):
+    """Generate a diverse set of math problems using GPT-4."""
+    if use_batch:
+        problems = generate_math_problems_batch()
+    else:
+        problems = asyncio.run(generate_math_problems_async())
+
     # Save to file
     output_file = "data/math_qa_expanded.json"
     os.makedirs("data", exist_ok=True)
-    with open(output_file, 'w') as f:
-        json.dump(problems, f, indent=4)
-    
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(problems, option=orjson.OPT_INDENT_2))
+
     print(f"\n✨ Generated {len(problems)} total problems and saved to {output_file}")
 
 if __name__ == "__main__":
-    generate_math_problems() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate practice math problems with GPT-4.")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit through the OpenAI Batch API (half price, completes within 24h)"
+    )
+    args = parser.parse_args()
+    generate_math_problems(use_batch=args.batch)
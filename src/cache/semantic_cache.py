@@ -0,0 +1,265 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+import orjson
+from src.knowledge_base.embeddings import embed_query
+
+logger = logging.getLogger(__name__)
+
+# Small local model so a lookup costs one cached encode rather than an API call
+CACHE_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Entries kept per namespace unless a cache asks for a different bound
+DEFAULT_MAX_ENTRIES = 1024
+
+# Numbers, variables, operators and function names must match exactly for a
+# semantic hit, since "2x + 3 = 7" and "2x + 3 = 9" embed almost identically
+_MATH_TOKEN_RE = re.compile(
+    r"\d+(?:\.\d+)?|(?<![a-z])(?:[a-z]|sin|cos|tan|sec|csc|cot|log|ln|exp|sqrt|lim)(?![a-z])|[^\sa-z\d]"
+)
+
+def cache_dir() -> str:
+    """Directory holding the persisted response caches, one record log per namespace."""
+    return os.path.expanduser(os.getenv("MATHRAG_CACHE_DIR", "~/.mathrag/cache"))
+
+def _normalize(query: str) -> str:
+    """Lowercase and collapse whitespace so trivial variations share an entry."""
+    return " ".join(query.lower().split())
+
+class _Record(NamedTuple):
+    context: str
+    query: str
+    signature: Tuple[str, ...]
+    vector: np.ndarray
+    result: Any
+    stored_at: float
+
+class SemanticCache:
+    """
+    Two-tier response cache: exact normalized match, then embedding similarity.
+
+    Both tiers read one set of records, oldest first, so expiry and the
+    max_entries bound apply to the namespace as a whole. Records are persisted
+    as an append-only JSON Lines log, compacted once it holds far more lines
+    than live records. Nothing is read from disk until the first call, and
+    results must be JSON-serializable to survive a restart.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        threshold: float = 0.95,
+        ttl: Optional[float] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.namespace = namespace
+        self.threshold = threshold
+        # Entries older than ttl seconds are ignored; None keeps them until evicted
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        # Exact-match digest -> record, oldest first
+        self._records: "OrderedDict[bytes, _Record]" = OrderedDict()
+        # Per-context (digests, stacked unit vectors), rebuilt only after that context changes
+        self._matrices: Dict[str, Tuple[List[bytes], np.ndarray]] = {}
+        # Lines in the log file, live or not
+        self._logged = 0
+
+    def _ensure_loaded(self):
+        """Replay the persisted log on first use; the caller holds the lock."""
+        if self.path is not None:
+            return
+        self.path = os.path.join(cache_dir(), f"{self.namespace}.jsonl")
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    self._logged += 1
+                    try:
+                        data = orjson.loads(line)
+                        record = _Record(
+                            data["context"],
+                            data["query"],
+                            tuple(data["signature"]),
+                            np.asarray(data["vector"], dtype=np.float32),
+                            data["result"],
+                            data["stored_at"]
+                        )
+                    except Exception as e:
+                        logger.warning("Skipping unreadable line in cache %s: %s", self.path, e)
+                        continue
+                    self._add(record)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Ignoring unreadable cache %s: %s", self.path, e)
+        self._prune(time.time())
+
+    def _add(self, record: _Record):
+        """Insert a record, replacing any earlier one for the same context and query."""
+        key = self._exact_key(record.context, record.query)
+        # Re-inserting moves the key to the newest position
+        self._records.pop(key, None)
+        self._records[key] = record
+        self._matrices.pop(record.context, None)
+
+    @staticmethod
+    def _dump(record: _Record) -> bytes:
+        return orjson.dumps(
+            {
+                "context": record.context,
+                "query": record.query,
+                "signature": record.signature,
+                "vector": record.vector,
+                "result": record.result,
+                "stored_at": record.stored_at
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+        )
+
+    def _persist(self, record: _Record):
+        """Append one record to the log, compacting it once it is mostly stale."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self._logged + 1 > 2 * len(self._records) + 16:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                for live in self._records.values():
+                    try:
+                        f.write(self._dump(live))
+                    except TypeError:
+                        # Results that are not JSON-serializable only live in memory
+                        continue
+            os.replace(tmp_path, self.path)
+            self._logged = len(self._records)
+        else:
+            line = self._dump(record)
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self._logged += 1
+
+    @staticmethod
+    def _exact_key(context: str, query: str) -> bytes:
+        return hashlib.blake2b(f"{context}\0{query}".encode("utf-8"), digest_size=16).digest()
+
+    def _is_fresh(self, stored_at: float, now: float) -> bool:
+        return self.ttl is None or now - stored_at <= self.ttl
+
+    def _prune(self, now: float):
+        """Drop expired records and, past max_entries, the oldest ones."""
+        # Records are ordered oldest first, so stale ones form a prefix
+        while self._records:
+            key, oldest = next(iter(self._records.items()))
+            if len(self._records) <= self.max_entries and self._is_fresh(oldest.stored_at, now):
+                break
+            del self._records[key]
+            self._matrices.pop(oldest.context, None)
+
+    def _matrix(self, context: str) -> Optional[Tuple[List[bytes], np.ndarray]]:
+        """Return the digests and stacked vectors for a context; the caller holds the lock."""
+        index = self._matrices.get(context)
+        if index is None:
+            keys = [key for key, record in self._records.items() if record.context == context]
+            if not keys:
+                return None
+            index = self._matrices[context] = (keys, np.stack([self._records[key].vector for key in keys]))
+        return index
+
+    def get(self, query: str, context: str = "") -> Optional[Any]:
+        """Return the cached result for a query, or None on a miss."""
+        query = _normalize(query)
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            record = self._records.get(self._exact_key(context, query))
+            if record is not None and self._is_fresh(record.stored_at, now):
+                return record.result
+            index = self._matrix(context)
+        if index is None:
+            return None
+        keys, matrix = index
+
+        # Cosine similarity is a dot product because the vectors are unit-normalized
+        scores = matrix @ np.asarray(embed_query(CACHE_MODEL_NAME, query), dtype=np.float32)
+        signature = tuple(_MATH_TOKEN_RE.findall(query))
+        with self._lock:
+            for i in np.argsort(scores)[::-1]:
+                if scores[i] < self.threshold:
+                    break
+                record = self._records.get(keys[i])
+                if record is not None and record.signature == signature and self._is_fresh(record.stored_at, now):
+                    return record.result
+        return None
+
+    def set(self, query: str, result: Any, context: str = ""):
+        """Store a result under both the exact and the semantic tier."""
+        query = _normalize(query)
+        vector = np.asarray(embed_query(CACHE_MODEL_NAME, query), dtype=np.float32)
+        record = _Record(context, query, tuple(_MATH_TOKEN_RE.findall(query)), vector, result, time.time())
+        with self._lock:
+            self._ensure_loaded()
+            self._add(record)
+            self._prune(record.stored_at)
+            try:
+                self._persist(record)
+            except Exception as e:
+                logger.warning("Error saving cache %s: %s", self.path, e)
+
+    def clear(self):
+        """Remove every entry, including the persisted copy."""
+        with self._lock:
+            self._ensure_loaded()
+            self._records = OrderedDict()
+            self._matrices = {}
+            self._logged = 0
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+def semantic_cache(
+    threshold: float = 0.95,
+    namespace: str = "default",
+    cache_if: Callable[[Any], bool] = bool,
+    ttl: Optional[float] = None,
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    key_attrs: Tuple[str, ...] = (),
+    on_hit: Optional[Callable[[Any, str], Any]] = None
+) -> Callable:
+    """
+    Cache a method whose first argument after self is the query text.
+
+    Remaining arguments, and the instance attributes named in key_attrs, are
+    part of the key, so only calls made with the same options and the same
+    configuration can share a result. Results failing cache_if (by default
+    anything falsy, such as empty search results) are returned but not stored.
+    on_hit(result, query) can rewrite query-specific fields of a cached result
+    found for a different but similar query. The cache is exposed as
+    wrapper.cache, e.g. for wrapper.cache.clear().
+    """
+    cache = SemanticCache(namespace, threshold, ttl, max_entries)
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(self, query: str, *args, **kwargs):
+            config = tuple(getattr(self, attr) for attr in key_attrs)
+            context = repr((config, args, sorted(kwargs.items())))
+            result = cache.get(query, context)
+            if result is not None:
+                return on_hit(result, query) if on_hit else result
+
+            result = func(self, query, *args, **kwargs)
+            if cache_if(result):
+                cache.set(query, result, context)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,34 @@
+"""Shared Qdrant clients for the knowledge bases."""
+from functools import lru_cache
+from qdrant_client import QdrantClient
+import os
+
+# Qdrant server to use instead of local storage, e.g. http://localhost:6333
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+
+@lru_cache(maxsize=None)
+def get_qdrant_client(location: str) -> QdrantClient:
+    """
+    Return a shared Qdrant client.
+    
+    When QDRANT_URL is set, connect to that server over gRPC, which avoids
+    JSON-encoding vectors on every call. Otherwise open local storage at
+    `location` (a directory, or ":memory:"). Local storage can only be
+    opened by one client per process, so clients are cached per location.
+    """
+    if QDRANT_URL:
+        return QdrantClient(url=QDRANT_URL, prefer_grpc=True, grpc_port=QDRANT_GRPC_PORT)
+    if location == ":memory:":
+        return QdrantClient(location)
+    try:
+        return QdrantClient(path=location)
+    except RuntimeError as e:
+        # Local storage is locked to the first process that opens it
+        if "already accessed" not in str(e):
+            raise
+        raise RuntimeError(
+            f"The knowledge base at {location} is already open in another process "
+            "(e.g. the Streamlit app, pytest or test_prompt.py). Stop that process, "
+            "point QDRANT_PATH at a different directory, or run a Qdrant server and set QDRANT_URL."
+        ) from e
@@ -0,0 +1,24 @@
+from typing import Tuple
+from functools import lru_cache
+import torch
+from sentence_transformers import SentenceTransformer
+
+@lru_cache(maxsize=None)
+def get_embedding_model(model_name: str) -> SentenceTransformer:
+    """Load a sentence transformer once per process and share it between knowledge bases."""
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda":
+        # fp16 halves memory traffic on GPU; CPU kernels are faster in fp32
+        model.half()
+    return model
+
+@lru_cache(maxsize=4096)
+def embed_query(model_name: str, query: str) -> Tuple[float, ...]:
+    """Embed a search query, caching repeats from retry and refinement loops."""
+    vector = get_embedding_model(model_name).encode(
+        query,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    return tuple(vector.tolist())
@@ -1,10 +1,10 @@
 from typing import List, Dict, Any
 import json
 import os
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from src.knowledge_base._client import get_qdrant_client
+from src.knowledge_base.embeddings import embed_query, get_embedding_model
 
 class KnowledgeBase:
     """Class to manage the knowledge base for math problems and solutions."""
@@ -12,10 +12,11 @@ class KnowledgeBase:
     def __init__(self, collection_name: str = "math_qa"):
         """Initialize the knowledge base."""
         # Initialize sentence transformer model
-        self.model = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
+        self.model_name = 'sentence-transformers/all-mpnet-base-v2'
+        self.model = get_embedding_model(self.model_name)
         
         # Initialize Qdrant client
-        self.client = QdrantClient(":memory:")  # Use in-memory storage for testing
+        self.client = get_qdrant_client(":memory:")  # Use in-memory storage for testing unless QDRANT_URL is set
         
         # Create collection if it doesn't exist
         self.collection_name = collection_name
@@ -31,7 +32,7 @@ class KnowledgeBase:
                 collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
                     size=768,  # Dimension of sentence-transformer embeddings
-                    distance=models.Distance.COSINE
+                    distance=models.Distance.DOT  # Embeddings are unit-normalized at encode time
                 )
             )
         except Exception as e:
@@ -44,40 +45,60 @@ class KnowledgeBase:
             with open(data_file, "r") as f:
                 qa_pairs = json.load(f)
             
-            # Add each Q&A pair to the vector store
-            for i, qa in enumerate(qa_pairs):
-                self.add_qa_pair(qa["question"], qa["answer"], qa.get("metadata", {}), i)
+            # Encode and upsert all Q&A pairs in one batch
+            self.add_qa_pairs(qa_pairs)
     
     def add_qa_pair(self, question: str, answer: str, metadata: Dict[str, Any], id: int):
         """Add a Q&A pair to the knowledge base."""
-        # Generate embedding for the question
-        embedding = self.model.encode(question)
+        self.add_qa_pairs([{"question": question, "answer": answer, "metadata": metadata}], start_id=id)
+    
+    def add_qa_pairs(self, qa_pairs: List[Dict[str, Any]], start_id: int = 0):
+        """
+        Add a batch of Q&A pairs to the knowledge base.
+        
+        Args:
+            qa_pairs: Dicts with "question", "answer" and optional "metadata" keys
+            start_id: Point id assigned to the first pair; later pairs count up from it
+        """
+        if not qa_pairs:
+            return
+        
+        # Generate embeddings for all questions in a single batched forward pass
+        questions = [qa["question"] for qa in qa_pairs]
+        embeddings = self.model.encode(
+            questions,
+            batch_size=64,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
         
-        # Add point to the collection
+        # Add all points to the collection
         self.client.upsert(
             collection_name=self.collection_name,
             points=[
                 models.PointStruct(
-                    id=id,
+                    id=start_id + i,
                     vector=embedding.tolist(),
                     payload={
-                        "question": question,
-                        "answer": answer,
-                        **metadata
+                        "question": qa["question"],
+                        "answer": qa["answer"],
+                        **qa.get("metadata", {})
                     }
                 )
+                for i, (qa, embedding) in enumerate(zip(qa_pairs, embeddings))
             ]
         )
     
     def search_similar_questions(self, question: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Search for similar questions in the knowledge base."""
-        # Generate embedding for the query
-        query_vector = self.model.encode(question)
+        # Generate embedding for the query (cached for repeated questions)
+        query_vector = embed_query(self.model_name, question)
         
         # Search for similar questions
         results = self.client.search(
             collection_name=self.collection_name,
-            query_vector=query_vector.tolist(),
+            query_vector=list(query_vector),
             limit=limit
         )
         
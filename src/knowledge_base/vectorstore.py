@@ -1,8 +1,31 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
+import asyncio
+import hashlib
+import itertools
+import os
+import numpy as np
+import orjson
 from datasets import load_dataset
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from src.knowledge_base._client import get_qdrant_client
+from src.knowledge_base.embeddings import embed_query, get_embedding_model
+
+# Local directory holding the persisted Qdrant index (unused when QDRANT_URL is set);
+# the default sits under the project root so every entry point shares one index
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+QDRANT_PATH = os.getenv("QDRANT_PATH", os.path.join(_PROJECT_ROOT, "data", "qdrant"))
+
+# Directory holding precomputed corpus embeddings and their payloads
+EMBEDDING_CACHE_DIR = os.path.expanduser(os.getenv("MATHKB_CACHE_DIR", "~/.cache/mathkb"))
+
+DATASET_NAME = "EleutherAI/hendrycks_math"
+DATASET_CONFIG = "algebra"
+NUM_PROBLEMS = 1000  # First 1000 problems for faster startup
+
+# Embeddings are unit-normalized at encode time, so a dot product is the cosine score
+NORMALIZE_EMBEDDINGS = True
+VECTOR_DISTANCE = models.Distance.DOT
 
 class MathKnowledgeBase:
     """Knowledge base for math problems using Qdrant vector store."""
@@ -10,10 +33,11 @@ class MathKnowledgeBase:
     def __init__(self):
         """Initialize the knowledge base."""
         # Initialize the embedding model
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.model_name = 'sentence-transformers/all-MiniLM-L6-v2'
+        self.model = get_embedding_model(self.model_name)
         
-        # Initialize Qdrant client (in-memory)
-        self.client = QdrantClient(":memory:")
+        # Initialize Qdrant client (persisted on disk so the index survives restarts)
+        self.client = get_qdrant_client(QDRANT_PATH)
         self.collection_name = "math_problems"
         
         # Initialize the vector store
@@ -21,62 +45,134 @@ class MathKnowledgeBase:
 
     def _initialize_vectorstore(self):
         """Initialize the vector store with math problems."""
-        print("Loading Berkeley MATH dataset from Hugging Face...")
+        if self._collection_is_populated():
+            print(f"Using existing vector store at {QDRANT_PATH}")
+            return
         
-        # Load dataset
-        dataset = load_dataset("EleutherAI/hendrycks_math", "algebra")
-        problems = dataset["train"][:1000]  # Load first 1000 problems for faster startup
+        embeddings, metadata = self._load_cached_embeddings()
+        if embeddings is None:
+            embeddings, metadata = self._embed_dataset()
+            self._save_cached_embeddings(embeddings, metadata)
         
         # Create collection
         self.client.recreate_collection(
             collection_name=self.collection_name,
-            vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE)
+            vectors_config=models.VectorParams(
+                size=self.model.get_sentence_embedding_dimension(),
+                distance=VECTOR_DISTANCE,
+                on_disk=True  # Keep full-precision vectors on disk
+            ),
+            hnsw_config=models.HnswConfigDiff(m=32, ef_construct=256, on_disk=True),
+            # int8 copies stay in RAM for scoring, ~4x smaller than float32
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        )
+        
+        # Stream all points to Qdrant; the client batches and parallelizes the upload
+        self.client.upload_collection(
+            collection_name=self.collection_name,
+            vectors=embeddings,
+            payload=metadata,
+            ids=list(range(len(metadata))),
+            batch_size=256,
+            parallel=4
         )
+        print(f"Uploaded {len(metadata)} problems")
+
+    def _embed_dataset(self) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Load the MATH problems and encode them."""
+        print("Loading Berkeley MATH dataset from Hugging Face...")
+        # Stream only the rows we need instead of downloading the full split
+        stream = load_dataset(DATASET_NAME, DATASET_CONFIG, split="train", streaming=True)
+        problems = list(itertools.islice(stream, NUM_PROBLEMS))
         
         # Prepare problems for vectorization
-        texts = []
-        metadata = []
+        texts = [f"{problem['problem']}\n{problem['solution']}" for problem in problems]
+        metadata = [
+            {
+                "question": problem["problem"],
+                "solution": problem["solution"],
+                "answer": problem.get("answer", ""),
+                "category": "algebra"
+            }
+            for problem in problems
+        ]
+        
+        print(f"Encoding {len(texts)} problems...")
+        
+        # Encode everything in one call: SentenceTransformer.encode sorts its
+        # input by length before batching (and restores the order afterwards),
+        # so passing the full list minimizes padding across all problems.
+        embeddings = self.model.encode(
+            texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=NORMALIZE_EMBEDDINGS
+        )
+        return embeddings, metadata
+
+    def _embedding_cache_paths(self) -> Tuple[str, str]:
+        """Return the embedding and payload cache files for the current model, dataset and scoring."""
+        # Vectors cached before normalization would score wrongly under DOT distance
+        key = hashlib.sha256(
+            f"{self.model_name}|{DATASET_NAME}|{DATASET_CONFIG}|{NUM_PROBLEMS}"
+            f"|normalized={NORMALIZE_EMBEDDINGS}|{VECTOR_DISTANCE}".encode()
+        ).hexdigest()[:16]
+        base = os.path.join(EMBEDDING_CACHE_DIR, key)
+        return f"{base}.npy", f"{base}.json"
+
+    def _load_cached_embeddings(self) -> Tuple[Optional[np.ndarray], Optional[List[Dict[str, Any]]]]:
+        """Load precomputed embeddings and payloads, or (None, None) on a cache miss."""
+        embeddings_path, metadata_path = self._embedding_cache_paths()
+        if not (os.path.exists(embeddings_path) and os.path.exists(metadata_path)):
+            return None, None
         
-        for problem in problems:
-            try:
-                texts.append(f"{problem['problem']}\n{problem['solution']}")
-                metadata.append({
-                    "question": problem["problem"],
-                    "solution": problem["solution"],
-                    "answer": problem.get("answer", ""),
-                    "category": "algebra"
-                })
-            except Exception as e:
-                print(f"Skipping problem: {e}")
-                continue
+        try:
+            # Memory-map the vectors; they are only read once for the upload
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+            with open(metadata_path, "rb") as f:
+                metadata = orjson.loads(f.read())
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache: {e}")
+            return None, None
         
-        print(f"Loading {len(texts)} problems into vector store...")
+        if len(embeddings) != len(metadata):
+            return None, None
+        print(f"Loaded {len(metadata)} cached problem embeddings")
+        return embeddings, metadata
+
+    def _save_cached_embeddings(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]):
+        """Save embeddings and payloads so later starts skip encoding."""
+        embeddings_path, metadata_path = self._embedding_cache_paths()
+        try:
+            os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+            np.save(embeddings_path, embeddings)
+            with open(metadata_path, "wb") as f:
+                f.write(orjson.dumps(metadata))
+        except Exception as e:
+            print(f"Could not save embedding cache: {e}")
+
+    def _collection_is_populated(self) -> bool:
+        """Check whether a previous run fully indexed the problems with the current settings."""
+        existing = {c.name for c in self.client.get_collections().collections}
+        if self.collection_name not in existing:
+            return False
         
-        # Vectorize in batches
-        batch_size = 100
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_metadata = metadata[i:i + batch_size]
-            
-            # Get embeddings for batch
-            embeddings = self.model.encode(batch_texts)
-            
-            # Create points
-            points = [
-                models.PointStruct(
-                    id=idx + i,
-                    vector=embedding.tolist(),
-                    payload=meta
-                )
-                for idx, (embedding, meta) in enumerate(zip(embeddings, batch_metadata))
-            ]
-            
-            # Upload batch
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
-            print(f"Uploaded {i + len(batch_texts)}/{len(texts)} problems")
+        # A collection from another distance or model, or an interrupted upload, is rebuilt
+        vectors = self.client.get_collection(self.collection_name).config.params.vectors
+        if vectors.distance != VECTOR_DISTANCE or vectors.size != self.model.get_sentence_embedding_dimension():
+            print(f"Rebuilding vector store: stored {vectors.distance} vectors of size {vectors.size} do not match")
+            return False
+        count = self.client.count(collection_name=self.collection_name, exact=True).count
+        if count != NUM_PROBLEMS:
+            print(f"Rebuilding vector store: found {count} of {NUM_PROBLEMS} problems")
+            return False
+        return True
 
     def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
@@ -89,21 +185,29 @@ class MathKnowledgeBase:
         Returns:
             List of similar problems with their solutions
         """
-        # Get query embedding
-        query_vector = self.model.encode(query).tolist()
+        # Get query embedding (cached for repeated queries)
+        query_vector = embed_query(self.model_name, query)
         
         # Search
         results = self.client.search(
             collection_name=self.collection_name,
-            query_vector=query_vector,
+            query_vector=list(query_vector),
             limit=limit
         )
         
-        # Format results
-        formatted_results = []
-        for hit in results:
-            result = hit.payload.copy()  # Copy to avoid modifying the original
-            result["similarity_score"] = float(hit.score) if hasattr(hit, "score") else 0.0
-            formatted_results.append(result)
-            
-        return formatted_results 
\ No newline at end of file
+        return self._format_hits(results)
+
+    @staticmethod
+    def _format_hits(results) -> List[Dict[str, Any]]:
+        """Convert scored points into result dicts with a similarity score."""
+        # Build each result in one dict; the payload itself is left untouched
+        return [{**hit.payload, "similarity_score": float(hit.score)} for hit in results]
+
+    async def asearch(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Async variant of search that runs in a worker thread so it can overlap other I/O."""
+        return await asyncio.to_thread(self.search, query, limit)
+
+@lru_cache(maxsize=None)
+def get_knowledge_base() -> MathKnowledgeBase:
+    """Return the process-wide knowledge base, building it on first use."""
+    return MathKnowledgeBase()
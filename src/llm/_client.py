@@ -0,0 +1,55 @@
+"""Shared OpenAI clients for the math agent."""
+from functools import lru_cache
+from openai import AsyncOpenAI, OpenAI
+import asyncio
+import httpx
+import os
+import threading
+
+# Keep-alive pool shared by every call through one client
+_POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=64)
+
+@lru_cache(maxsize=None)
+def get_openai_client() -> OpenAI:
+    """
+    Return the process-wide OpenAI client.
+    
+    All components share one connection pool so keep-alive connections stay
+    warm across the solve, refine and MCP calls. Transient errors such as
+    rate limits and timeouts are retried with exponential backoff.
+    """
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=5,
+        http_client=httpx.Client(limits=_POOL_LIMITS, timeout=60.0)
+    )
+
+# AsyncOpenAI clients keyed by the event loop they were created in
+_async_clients: dict = {}
+_async_clients_lock = threading.Lock()
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Return the AsyncOpenAI client for the running event loop.
+    
+    An async connection pool only works within the loop it was created in, so
+    each loop gets its own client, shared by every coroutine running in it.
+    Call aclose_async_openai_client before a short-lived loop shuts down.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=5,
+                http_client=httpx.AsyncClient(limits=_POOL_LIMITS, timeout=60.0)
+            )
+    return client
+
+async def aclose_async_openai_client():
+    """Close and forget the running event loop's client, if it has one."""
+    with _async_clients_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
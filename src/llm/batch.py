@@ -0,0 +1,64 @@
+"""OpenAI Batch API helpers shared by the offline solve and generation runs."""
+from typing import Dict
+import io
+import time
+import orjson
+from openai import OpenAI
+
+# Seconds between status checks while waiting on a Batch API job
+BATCH_POLL_INTERVAL = 30
+
+def submit_batch(client: OpenAI, bodies: Dict[str, dict], filename: str = "batch.jsonl") -> str:
+    """
+    Submit one chat completion per request body as a single Batch API job.
+
+    bodies maps each request's custom_id to its request body. Batch jobs are
+    billed at half the real-time price but may take up to 24 hours to complete.
+    """
+    # One JSONL request line per body, keyed by its custom_id
+    requests_jsonl = b"\n".join(
+        orjson.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body
+        })
+        for custom_id, body in bodies.items()
+    )
+    batch_file = client.files.create(file=(filename, io.BytesIO(requests_jsonl)), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"📦 Submitted batch {batch.id} with {len(bodies)} requests, waiting for completion...")
+    return batch.id
+
+def collect_batch(client: OpenAI, batch_id: str) -> Dict[str, str]:
+    """
+    Wait for a batch job to finish and return each reply's message content by custom_id.
+
+    Failed requests are reported and left out, so callers decide how to fill the gaps.
+    """
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(BATCH_POLL_INTERVAL)
+        batch = client.batches.retrieve(batch_id)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        print(f"❌ Batch {batch_id} finished with status {batch.status}")
+        return {}
+
+    # Output lines are not guaranteed to be in submission order
+    contents = {}
+    output = client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            print(f"❌ Batch request {result['custom_id']} failed: {result.get('error')}")
+            continue
+        contents[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return contents
@@ -1,13 +1,13 @@
 from typing import Dict, Optional, Any, List
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import re
 import dspy
-import asyncio
 import nest_asyncio
+from src.llm._client import get_async_openai_client, get_openai_client
 from src.validation.schema import MathQuery
-from src.knowledge_base.vectorstore import MathKnowledgeBase
-from src.web_search.searcher import MathWebSearcher
+from src.knowledge_base.vectorstore import get_knowledge_base
+from src.web_search.searcher import get_web_searcher
 from src.feedback.collector import FeedbackCategory
 
 # Apply nest_asyncio to allow nested event loops
@@ -23,6 +23,10 @@ lm = dspy.LM(
 )
 dspy.settings.configure(lm=lm)
 
+# Characters stripped from the final answer line for letter and numeric answers
+_NONALPHA = re.compile(r"[^A-Za-z]")
+_NONNUM = re.compile(r"[^0-9.\-]")
+
 class MathSolutionRefinementSignature(dspy.Signature):
     """Signature for refining math solutions based on feedback."""
     
@@ -42,13 +46,6 @@ class MathSolutionRefiner(dspy.Module):
     def forward(self, question: str, previous_solution: str, feedback: str, categories: List[str]) -> str:
         """Refine the solution based on feedback."""
         try:
-            # Create new event loop if none exists
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
             result = self.refine(
                 question=question,
                 previous_solution=previous_solution,
@@ -59,7 +56,7 @@ class MathSolutionRefiner(dspy.Module):
         except Exception as e:
             print(f"Error in DSPy refinement: {str(e)}")
             # Fallback to regular OpenAI completion if DSPy fails
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            client = get_openai_client()
             prompt = f"""Given a math problem and feedback, provide an improved solution.
 
 Question: {question}
@@ -90,9 +87,9 @@ class SolutionGenerator:
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        self.client = OpenAI(api_key=self.api_key)
-        self.knowledge_base = MathKnowledgeBase()
-        self.web_searcher = MathWebSearcher()
+        self.client = get_openai_client()
+        self.knowledge_base = get_knowledge_base()
+        self.web_searcher = get_web_searcher()
         
         # Load prompt templates for answer extraction
         self.answer_templates = {
@@ -148,6 +145,43 @@ Answer:"""
             "Integer": "Please solve this math problem step by step:\n{question}\n\nProvide your final answer as a single integer at the end.",
             "Numeric": "Please solve this math problem step by step:\n{question}\n\nProvide your final answer as a number at the end."
         }
+        
+        # Pre-bind the template formatters once instead of looking them up per call
+        self._answer_formatters = {qtype: template.format for qtype, template in self.answer_templates.items()}
+        self._explanation_formatters = {qtype: template.format for qtype, template in self.explanation_templates.items()}
+        self._default_explanation_formatter = self._explanation_formatters["MCQ"]
+    
+    def _solve_request(self, query: MathQuery) -> Dict[str, Any]:
+        """Build the chat completion request for a math problem."""
+        # Format prompt with the template for this question type
+        format_prompt = self._explanation_formatters.get(query.type, self._default_explanation_formatter)
+        prompt = format_prompt(question=query.question)
+        
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are a highly skilled mathematics professor who excels at solving complex math problems step by step."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0
+        }
+    
+    def _parse_solution(self, query: MathQuery, solution_text: str) -> Dict[str, Any]:
+        """Split a generated solution into the full text and the final answer."""
+        # Extract final answer from the last non-empty line
+        final_answer = solution_text.rstrip().rsplit("\n", 1)[-1].strip()
+        
+        # For MCQ and MCQ(multiple), extract just the letter(s)
+        if query.type in ["MCQ", "MCQ(multiple)"]:
+            final_answer = _NONALPHA.sub("", final_answer).upper()
+        # For Integer and Numeric, extract just the number
+        elif query.type in ["Integer", "Numeric"]:
+            final_answer = _NONNUM.sub("", final_answer)
+        
+        return {
+            "solution": solution_text,
+            "answer": final_answer
+        }
     
     def solve(self, query: MathQuery) -> Dict[str, Any]:
         """
@@ -159,41 +193,23 @@ Answer:"""
         Returns:
             Dictionary containing the solution and answer
         """
-        # Get appropriate prompt template
-        prompt_template = self.explanation_templates.get(query.type, self.explanation_templates["MCQ"])
-        
-        # Format prompt
-        prompt = prompt_template.format(question=query.question)
-        
         try:
             # Call GPT-4 to generate solution
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a highly skilled mathematics professor who excels at solving complex math problems step by step."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-            
-            # Extract solution text
-            solution_text = response.choices[0].message.content
-            
-            # Extract final answer
-            answer_lines = [line for line in solution_text.split("\n") if line.strip()]
-            final_answer = answer_lines[-1].strip()
-            
-            # For MCQ and MCQ(multiple), extract just the letter(s)
-            if query.type in ["MCQ", "MCQ(multiple)"]:
-                final_answer = ''.join(c for c in final_answer if c.isalpha()).upper()
-            # For Integer and Numeric, extract just the number
-            elif query.type in ["Integer", "Numeric"]:
-                final_answer = ''.join(c for c in final_answer if c.isdigit() or c in ['.', '-'])
+            response = self.client.chat.completions.create(**self._solve_request(query))
+            return self._parse_solution(query, response.choices[0].message.content)
             
+        except Exception as e:
+            print(f"Error generating solution: {str(e)}")
             return {
-                "solution": solution_text,
-                "answer": final_answer
+                "solution": "",
+                "answer": ""
             }
+    
+    async def asolve(self, query: MathQuery) -> Dict[str, Any]:
+        """Async variant of solve, so many problems can be in flight at once."""
+        try:
+            response = await get_async_openai_client().chat.completions.create(**self._solve_request(query))
+            return self._parse_solution(query, response.choices[0].message.content)
             
         except Exception as e:
             print(f"Error generating solution: {str(e)}")
@@ -204,7 +220,7 @@ Answer:"""
 
     def get_answer(self, query: MathQuery, kb_context: str, web_context: str) -> str:
         """Get just the answer without explanation."""
-        prompt = self.answer_templates[query.type].format(
+        prompt = self._answer_formatters[query.type](
             question=query.question,
             kb_context=kb_context,
             web_context=web_context
@@ -230,10 +246,10 @@ class MathSolutionGenerator:
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_openai_client()
         self.refiner = MathSolutionRefiner()
-        self.knowledge_base = MathKnowledgeBase()
-        self.web_searcher = MathWebSearcher()
+        self.knowledge_base = get_knowledge_base()
+        self.web_searcher = get_web_searcher()
         
         self.base_prompt = """You are an expert math professor who explains solutions step by step.
 Given a math problem and relevant context, provide a clear, student-friendly solution.
@@ -5,7 +5,7 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from .validation.schema import MathQuery
-from .knowledge_base.vectorstore import MathKnowledgeBase
+from .knowledge_base.vectorstore import get_knowledge_base
 from .web_search.search import WebSearchVerifier
 from .solution.formatter import SolutionFormatter
 from .feedback.feedback_loop import FeedbackManager
@@ -27,7 +27,7 @@ dspy.settings.configure(
 class MathAgent:
     def __init__(self):
         """Initialize the Math Agent with all components."""
-        self.knowledge_base = MathKnowledgeBase()
+        self.knowledge_base = get_knowledge_base()
         self.web_search = WebSearchVerifier()
         self.formatter = SolutionFormatter()
         self.feedback_manager = FeedbackManager()
@@ -0,0 +1,51 @@
+from typing import Dict, List
+import orjson
+from src.llm._client import get_openai_client
+from src.llm.batch import collect_batch, submit_batch
+from src.mcp.solution_verifier import build_solve_all_body, format_solution
+
+def submit(queries: List[str]) -> str:
+    """
+    Submit the fused solve call for every query as one OpenAI Batch API job.
+
+    Batch jobs are billed at half the real-time price but may take up to
+    24 hours to complete, so this is meant for offline evaluation runs;
+    the interactive app stays on the real-time API.
+    """
+    # One request per query, keyed by its position
+    bodies = {
+        f"q{i}": build_solve_all_body(f"Solve this math problem: {query}")
+        for i, query in enumerate(queries)
+    }
+    return submit_batch(get_openai_client(), bodies, "mcp_batch.jsonl")
+
+def collect(batch_id: str) -> Dict[str, str]:
+    """Wait for a batch job to finish and return the formatted solutions keyed by custom_id."""
+    solutions = {}
+    for custom_id, content in collect_batch(get_openai_client(), batch_id).items():
+        # A malformed reply fails only its own problem, not the whole collection
+        try:
+            solutions[custom_id] = _format_batch_solution(orjson.loads(content))
+        except Exception as e:
+            print(f"❌ Error parsing solution for {custom_id}: {e}")
+            solutions[custom_id] = "Could not generate a verified solution."
+    return solutions
+
+def _format_batch_solution(solution: Dict) -> str:
+    """Turn one structured batch reply into the solution text."""
+    # There is no follow-up call offline, so unverified steps fail the problem
+    steps = solution["steps"]
+    failed = [i for i, step in enumerate(steps) if not step["verified"]]
+    if not steps:
+        return "Could not break down the problem into steps."
+    if failed:
+        return f"Could not generate a verified solution for step {failed[0] + 1}: {steps[failed[0]]['task']}"
+    return format_solution(steps, solution["final_answer"])
+
+def generate_solution_with_verification_batch(queries: List[str]) -> List[str]:
+    """Solve many problems through the Batch API, returning solutions in query order."""
+    solutions = collect(submit(queries))
+    return [
+        solutions.get(f"q{i}", "Could not generate a verified solution.")
+        for i in range(len(queries))
+    ]
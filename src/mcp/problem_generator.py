@@ -1,14 +1,14 @@
 from typing import List, Dict
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
+from src.llm._client import get_openai_client
+import orjson
 
 load_dotenv()
 
 class MCPGenerator:
     def __init__(self):
         """Initialize the MCP generator with OpenAI."""
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_openai_client()
         
         self.base_prompt = """You are an expert math professor who creates similar math problems.
 Given a math problem, generate {num_variations} similar problems that test the same concepts but with:
@@ -40,7 +40,7 @@ Format each problem as a JSON object with:
         
         try:
             # Parse the JSON response
-            variations = eval(response.choices[0].message.content)
+            variations = orjson.loads(response.choices[0].message.content)
             return variations.get("problems", [])
         except Exception as e:
             print(f"Error parsing MCP response: {e}")
@@ -1,19 +1,28 @@
-from typing import Dict, List, Optional, Tuple
-from openai import OpenAI
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
 import os
 import json
+from src.cache.semantic_cache import semantic_cache
+from src.llm._client import aclose_async_openai_client, get_async_openai_client
+from src.mcp.throttle import AsyncRateLimiter
 
 load_dotenv()
 
-class MCPSolutionVerifier:
-    def __init__(self):
-        """Initialize the MCP solution verifier."""
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
-    def break_down_problem(self, query: str) -> List[Dict]:
-        """Break down a complex math problem into smaller, verifiable steps."""
-        system_prompt = """You are a math expert that breaks down complex problems into smaller, verifiable steps.
+# Every system prompt starts with the same fixed text, and all per-problem data
+# goes in the user message, so the prompts stay consistent across calls. The
+# prefix is far below the 1024 tokens OpenAI's prompt caching needs, so it is
+# not expected to produce cache hits
+_SYSTEM_PREFIX = """You are a math expert working through problems as small, verifiable steps: \
+breaking a problem down, solving each step, and checking each result.
+
+"""
+
+_BREAKDOWN_SYS = _SYSTEM_PREFIX + """Your job is to break complex problems down into smaller, verifiable steps.
 For each step, you should:
 1. State what needs to be solved
 2. Explain why this step is necessary
@@ -32,82 +41,283 @@ Step 1:
 Step 2:
 [and so on...]"""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
+# Compact JSON breakdown used when terse prompts are enabled
+_TERSE_BREAKDOWN_SYS = _SYSTEM_PREFIX + """Break the problem into steps. Reply only with JSON:
+{"s":[{"t":"task","p":["prerequisite"],"v":"how to verify","e":["edge case"]}]}"""
+
+# Constrains terse verification to a single-letter verdict
+_TERSE_VERDICT_SCHEMA = {
+    "name": "verdict",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"verdict": {"type": "string", "enum": ["Y", "N"]}},
+        "required": ["verdict"],
+        "additionalProperties": False
+    }
+}
+
+_SOLVE_SYS = _SYSTEM_PREFIX + "Your job is to provide clear, step-by-step solutions."
+
+_VERIFY_SYS = _SYSTEM_PREFIX + "Your job is to verify solution steps."
+
+# Single-call prompt that breaks down, solves and self-checks the whole problem
+SOLVE_ALL_SYSTEM_PROMPT = _SYSTEM_PREFIX + """Your job is to solve the whole problem in one response.
+Break the problem down into steps. For each step:
+1. State what needs to be solved
+2. Solve it clearly, showing the work
+3. Check the result against the step's verification method and any edge cases
+4. Mark the step verified only if the check passes, and give the reason
+
+Finish with the final answer to the whole problem."""
+
+# Structured output schema shared by the fused call and its retry follow-up
+SOLUTION_SCHEMA = {
+    "name": "verified_solution",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "task": {"type": "string"},
+                        "solution": {"type": "string"},
+                        "verified": {"type": "boolean"},
+                        "reason": {"type": "string"}
+                    },
+                    "required": ["task", "solution", "verified", "reason"],
+                    "additionalProperties": False
+                }
+            },
+            "final_answer": {"type": "string"}
+        },
+        "required": ["steps", "final_answer"],
+        "additionalProperties": False
+    }
+}
+
+def _log_cache_usage(usage):
+    """Log how much of a prompt was served from OpenAI's prompt cache."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is not None:
+        logger.debug("prompt tokens: %d, cached: %d", usage.prompt_tokens, details.cached_tokens or 0)
+
+def build_solve_all_body(user_prompt: str, model: str = "gpt-4o") -> Dict:
+    """Build the chat completion request body for the fused solve call."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SOLVE_ALL_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        "response_format": {"type": "json_schema", "json_schema": SOLUTION_SCHEMA},
+        "temperature": 0.2
+    }
+
+def format_solution(steps: List[Dict], final_answer: str) -> str:
+    """Render fused-call steps in the same layout as the stepwise pipeline."""
+    complete_solution = [
+        f"Step {i}: {step['task']}\n{step['solution']}\n"
+        for i, step in enumerate(steps, 1)
+    ]
+    complete_solution.append(f"Final answer: {final_answer}")
+    return "\n".join(complete_solution)
+
+# Steps verified per batched call; larger batches mostly add output tokens
+VERIFY_BATCH_SIZE = 8
+
+def _run_sync(coro):
+    """Run a coroutine to completion on a fresh event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # asyncio.run cannot nest inside a running loop, so use a worker thread's loop
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+class MCPSolutionVerifier:
+    def __init__(
+        self,
+        terse_prompts: Optional[bool] = None,
+        solver_model: str = "gpt-4o",
+        verifier_model: str = "gpt-4o-mini"
+    ):
+        """
+        Initialize the MCP solution verifier.
+
+        Steps are solved with solver_model and checked with the cheaper
+        verifier_model; a rejected step is re-checked with solver_model.
+
+        terse_prompts switches the stepwise breakdown and verification to compact
+        JSON replies; it defaults to the MCP_TERSE_PROMPTS environment flag.
+        """
+        if terse_prompts is None:
+            terse_prompts = os.getenv("MCP_TERSE_PROMPTS", "").lower() in ("1", "true", "yes")
+        self.terse_prompts = terse_prompts
+        self.solver_model = solver_model
+        self.verifier_model = verifier_model
+        # Parallel step calls can burst past the account's RPM/TPM limits otherwise
+        self.limiter = AsyncRateLimiter()
+
+    async def _create_completion(self, **kwargs):
+        """
+        Call the chat API within the rate limits.
+
+        Rate limits and timeouts are retried with backoff by the shared client
+        itself, so no retry layer is added here.
+        """
+        # Rough estimate: ~4 characters per prompt token plus the full completion budget
+        prompt_chars = sum(len(message["content"]) for message in kwargs["messages"])
+        await self.limiter.acquire(est_tokens=prompt_chars // 4 + kwargs.get("max_tokens", 1000))
+        response = await get_async_openai_client().chat.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            _log_cache_usage(response.usage)
+        return response
+
+    @staticmethod
+    def _parse_step_line(line: str, current_step: Optional[Dict]) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Feed one line of a breakdown into the step being parsed.
+
+        Returns the step finished by this line (if any) and the step now being parsed.
+        """
+        line = line.strip()
+        if not line:
+            return None, current_step
+
+        if line.lower().startswith('step'):
+            # Minimum requirements for a step to be kept
+            finished = current_step if current_step and current_step["task"] and current_step["explanation"] else None
+            return finished, {
+                "task": "",
+                "explanation": "",
+                "prerequisites": [],
+                "verification": "",
+                "edge_cases": []
+            }
+
+        if current_step is not None:
+            if line.startswith('- Task:') or line.startswith('Task:'):
+                current_step["task"] = line.split(':', 1)[1].strip()
+            elif line.startswith('- Explanation:') or line.startswith('Explanation:'):
+                current_step["explanation"] = line.split(':', 1)[1].strip()
+            elif line.startswith('- Prerequisites:') or line.startswith('Prerequisites:'):
+                prereqs = line.split(':', 1)[1].strip()
+                current_step["prerequisites"] = [p.strip() for p in prereqs.split(',') if p.strip()]
+            elif line.startswith('- Verification:') or line.startswith('Verification:'):
+                current_step["verification"] = line.split(':', 1)[1].strip()
+            elif line.startswith('- Edge cases:') or line.startswith('Edge cases:'):
+                edge_cases = line.split(':', 1)[1].strip()
+                current_step["edge_cases"] = [e.strip() for e in edge_cases.split(',') if e.strip()]
+        return None, current_step
+
+    async def _break_down_terse(self, query: str) -> List[Dict]:
+        """Break down a math problem with the compact JSON prompt."""
+        response = await self._create_completion(
+            model=self.solver_model,
+            messages=[
+                {"role": "system", "content": _TERSE_BREAKDOWN_SYS},
+                {"role": "user", "content": f"Break down this math problem: {query}"}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.2,
+            max_tokens=600
+        )
+
+        steps = json.loads(response.choices[0].message.content).get("s", [])
+        return [
+            {
+                "task": step["t"],
+                "explanation": "",
+                "prerequisites": step.get("p", []),
+                "verification": step.get("v", ""),
+                "edge_cases": step.get("e", [])
+            }
+            for step in steps
+            if step.get("t")
+        ]
+
+    async def stream_steps(self, query: str) -> AsyncIterator[Dict]:
+        """Break down a math problem, yielding each step as soon as the model finishes writing it."""
+        if self.terse_prompts:
+            # A JSON reply is only parseable once complete, so terse steps arrive together
+            for step in await self._break_down_terse(query):
+                yield step
+            return
+
+        stream = await self._create_completion(
+            model=self.solver_model,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _BREAKDOWN_SYS},
                 {"role": "user", "content": f"Break down this math problem: {query}"}
             ],
             temperature=0.2,
-            max_tokens=1000
+            max_tokens=1000,
+            stream=True,
+            stream_options={"include_usage": True}
         )
 
-        # Parse the response
+        # Parse complete lines as they arrive; a step is done once the next header starts
+        buffer = ""
+        current_step = None
+        async for chunk in stream:
+            if not chunk.choices:
+                # The final chunk carries only usage
+                _log_cache_usage(chunk.usage)
+                continue
+            buffer += chunk.choices[0].delta.content or ""
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                finished, current_step = self._parse_step_line(line, current_step)
+                if finished:
+                    yield finished
+
+        finished, current_step = self._parse_step_line(buffer, current_step)
+        if finished:
+            yield finished
+        if current_step and current_step["task"] and current_step["explanation"]:
+            yield current_step
+
+    async def break_down_problem(self, query: str) -> List[Dict]:
+        """Break down a complex math problem into smaller, verifiable steps."""
         try:
-            steps_text = response.choices[0].message.content
-            steps_list = []
-            current_step = None
-            
-            for line in steps_text.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                if line.lower().startswith('step'):
-                    if current_step:
-                        steps_list.append(current_step)
-                    current_step = {
-                        "task": "",
-                        "explanation": "",
-                        "prerequisites": [],
-                        "verification": "",
-                        "edge_cases": []
-                    }
-                elif current_step is not None:
-                    if line.startswith('- Task:') or line.startswith('Task:'):
-                        current_step["task"] = line.split(':', 1)[1].strip()
-                    elif line.startswith('- Explanation:') or line.startswith('Explanation:'):
-                        current_step["explanation"] = line.split(':', 1)[1].strip()
-                    elif line.startswith('- Prerequisites:') or line.startswith('Prerequisites:'):
-                        prereqs = line.split(':', 1)[1].strip()
-                        current_step["prerequisites"] = [p.strip() for p in prereqs.split(',') if p.strip()]
-                    elif line.startswith('- Verification:') or line.startswith('Verification:'):
-                        current_step["verification"] = line.split(':', 1)[1].strip()
-                    elif line.startswith('- Edge cases:') or line.startswith('Edge cases:'):
-                        edge_cases = line.split(':', 1)[1].strip()
-                        current_step["edge_cases"] = [e.strip() for e in edge_cases.split(',') if e.strip()]
-            
-            if current_step:
-                steps_list.append(current_step)
-            
-            # Validate steps
-            valid_steps = []
-            for step in steps_list:
-                if step["task"] and step["explanation"]:  # Minimum requirements
-                    valid_steps.append(step)
-            
-            return valid_steps if valid_steps else []
-            
+            return [step async for step in self.stream_steps(query)]
         except Exception as e:
             print(f"Error parsing steps: {e}")
-            print(f"Raw response: {steps_text}")
             return []
 
-    def verify_step(self, step: Dict, solution: str) -> bool:
+    async def verify_step(self, step: Dict, solution: str, model: Optional[str] = None) -> bool:
         """Verify if a solution step is correct."""
         prompt = f"""Verify if this solution step is correct:
 
 Step to verify: {step['task']}
 Proposed solution: {solution}
 Verification method: {step['verification']}
-Edge cases to consider: {', '.join(step['edge_cases'])}
+Edge cases to consider: {', '.join(step['edge_cases'])}"""
+
+        if self.terse_prompts:
+            response = await self._create_completion(
+                model=model or self.verifier_model,
+                messages=[
+                    {"role": "system", "content": _VERIFY_SYS},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_schema", "json_schema": _TERSE_VERDICT_SCHEMA},
+                temperature=0.1,
+                max_tokens=10
+            )
+            return json.loads(response.choices[0].message.content)["verdict"] == "Y"
 
-Is the solution correct? Respond with 'Yes' or 'No' and explain why."""
+        prompt += "\n\nIs the solution correct? Respond with 'Yes' or 'No' and explain why."
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
+        response = await self._create_completion(
+            model=model or self.verifier_model,
             messages=[
-                {"role": "system", "content": "You are a math expert that verifies solution steps."},
+                {"role": "system", "content": _VERIFY_SYS},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.1,
@@ -117,7 +327,72 @@ Is the solution correct? Respond with 'Yes' or 'No' and explain why."""
         verification_result = response.choices[0].message.content.lower()
         return verification_result.startswith('yes')
 
-    def generate_solution(self, step: Dict) -> str:
+    async def _verify_chunk(self, pairs: List[Tuple[Dict, str]], model: str) -> List[bool]:
+        """Verify up to VERIFY_BATCH_SIZE steps with a single model call."""
+        items = "\n\n".join(
+            f"""{idx}) Step to verify: {step['task']}
+Proposed solution: {solution}
+Verification method: {step['verification']}
+Edge cases to consider: {', '.join(step['edge_cases'])}"""
+            for idx, (step, solution) in enumerate(pairs, 1)
+        )
+        if self.terse_prompts:
+            reply_format = '{"results": [{"idx": <item number>, "verdict": "Y" or "N"}]}'
+            tokens_per_item = 12
+        else:
+            reply_format = '{"results": [{"idx": <item number>, "verdict": "YES" or "NO", "reason": "<one line>"}]}'
+            tokens_per_item = 80
+        prompt = f"""Verify if each numbered solution step below is correct.
+Return a JSON object {reply_format} with one entry per item.
+
+{items}"""
+
+        response = await self._create_completion(
+            model=model,
+            messages=[
+                {"role": "system", "content": _VERIFY_SYS},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.1,
+            max_tokens=tokens_per_item * len(pairs)
+        )
+
+        verdicts = {
+            str(result.get("idx")): str(result.get("verdict", "")).upper().startswith("Y")
+            for result in json.loads(response.choices[0].message.content).get("results", [])
+        }
+        # Items the model skipped count as unverified
+        return [verdicts.get(str(idx), False) for idx in range(1, len(pairs) + 1)]
+
+    async def verify_steps_batch(self, pairs: List[Tuple[Dict, str]], model: Optional[str] = None) -> List[bool]:
+        """Verify many (step, solution) pairs, marshaling them into as few calls as possible."""
+        chunks = [pairs[i:i + VERIFY_BATCH_SIZE] for i in range(0, len(pairs), VERIFY_BATCH_SIZE)]
+
+        async def verify(chunk: List[Tuple[Dict, str]]) -> List[bool]:
+            try:
+                return await self._verify_chunk(chunk, model or self.verifier_model)
+            except Exception as e:
+                # Fall back to one call per step if the batched response is unusable
+                print(f"Error verifying steps in batch: {e}")
+                return list(await asyncio.gather(*(self.verify_step(step, solution, model) for step, solution in chunk)))
+
+        results = await asyncio.gather(*(verify(chunk) for chunk in chunks))
+        return [is_correct for chunk_results in results for is_correct in chunk_results]
+
+    async def _verify_with_escalation(self, pairs: List[Tuple[Dict, str]]) -> List[bool]:
+        """Verify with the small model, re-checking its rejections with the solver model."""
+        verdicts = await self.verify_steps_batch(pairs)
+
+        # A step only fails when both models reject it
+        rejected = [i for i, is_correct in enumerate(verdicts) if not is_correct]
+        if rejected and self.verifier_model != self.solver_model:
+            second_opinions = await self.verify_steps_batch([pairs[i] for i in rejected], self.solver_model)
+            for i, is_correct in zip(rejected, second_opinions):
+                verdicts[i] = is_correct
+        return verdicts
+
+    async def generate_solution(self, step: Dict) -> str:
         """Generate a solution for a single step."""
         prompt = f"""Solve this math step:
 
@@ -128,10 +403,10 @@ Edge cases to consider: {', '.join(step['edge_cases'])}
 
 Provide a clear, step-by-step solution."""
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
+        response = await self._create_completion(
+            model=self.solver_model,
             messages=[
-                {"role": "system", "content": "You are a math expert that provides clear, step-by-step solutions."},
+                {"role": "system", "content": _SOLVE_SYS},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.2,
@@ -140,31 +415,119 @@ Provide a clear, step-by-step solution."""
 
         return response.choices[0].message.content
 
-    def generate_solution_with_verification(self, query: str) -> str:
+    async def _complete_json(self, user_prompt: str) -> Dict:
+        """Run one structured-output call against the fused solve prompt."""
+        response = await self._create_completion(**build_solve_all_body(user_prompt, self.solver_model))
+        return json.loads(response.choices[0].message.content)
+
+    async def _solve_all(self, query: str) -> str:
+        """Break down, solve and verify a problem in a single model call."""
+        try:
+            result = await self._complete_json(f"Solve this math problem: {query}")
+        except Exception as e:
+            print(f"Error generating fused solution: {e}")
+            return "Could not break down the problem into steps."
+
+        steps = result["steps"]
+        if not steps:
+            return "Could not break down the problem into steps."
+
+        # Re-solve every unverified step together in one follow-up call
+        failed = [i for i, step in enumerate(steps) if not step["verified"]]
+        if failed:
+            tasks = "\n".join(f"- {steps[i]['task']} (previous check failed: {steps[i]['reason']})" for i in failed)
+            try:
+                retried = await self._complete_json(
+                    f"While solving this math problem: {query}\n\n"
+                    f"Carefully re-solve only these steps, double-checking each calculation, "
+                    f"and return them in the same order:\n{tasks}"
+                )
+            except Exception as e:
+                print(f"Error re-solving failed steps: {e}")
+                retried = {"steps": []}
+
+            retry_steps = retried["steps"]
+            for n, i in enumerate(failed):
+                if n >= len(retry_steps) or not retry_steps[n]["verified"]:
+                    return f"Could not generate a verified solution for step {i + 1}: {steps[i]['task']}"
+                steps[i] = {**retry_steps[n], "task": steps[i]["task"]}
+
+        return format_solution(steps, result["final_answer"])
+
+    async def agenerate_solution_with_verification(self, query: str, stepwise: bool = False) -> str:
         """Generate and verify a complete solution for a math problem."""
-        # Break down the problem into steps
-        steps = self.break_down_problem(query)
+        if not stepwise:
+            return await self._solve_all(query)
+        return await self._solve_stepwise(query)
+
+    async def _solve_stepwise(self, query: str) -> str:
+        """Generate and verify a complete solution, solving and verifying all steps concurrently."""
+        # Start solving each step as soon as the breakdown stream finishes describing it
+        steps, tasks = [], []
+        try:
+            async for step in self.stream_steps(query):
+                steps.append(step)
+                tasks.append(asyncio.create_task(self.generate_solution(step)))
+        except Exception as e:
+            print(f"Error parsing steps: {e}")
+            for task in tasks:
+                task.cancel()
+            return "Could not break down the problem into steps."
         if not steps:
             return "Could not break down the problem into steps."
 
-        # Generate and verify solution for each step
-        complete_solution = []
-        for i, step in enumerate(steps, 1):
-            solution = self.generate_solution(step)
-            is_correct = self.verify_step(step, solution)
-            
-            if not is_correct:
-                # Try one more time with more detailed instructions
-                solution = self.generate_solution({
-                    **step,
-                    "task": f"Carefully solve: {step['task']}",
-                    "prerequisites": step['prerequisites'] + ["Double-check each calculation"]
+        # Wait for all step solutions, then verify them together
+        solutions = list(await asyncio.gather(*tasks))
+        verdicts = await self._verify_with_escalation(list(zip(steps, solutions)))
+
+        # Try the failing steps one more time with more detailed instructions
+        failed = [i for i, is_correct in enumerate(verdicts) if not is_correct]
+        if failed:
+            retry_solutions = await asyncio.gather(*(
+                self.generate_solution({
+                    **steps[i],
+                    "task": f"Carefully solve: {steps[i]['task']}",
+                    "prerequisites": steps[i]['prerequisites'] + ["Double-check each calculation"]
                 })
-                is_correct = self.verify_step(step, solution)
-                
+                for i in failed
+            ))
+            retry_verdicts = await self._verify_with_escalation([
+                (steps[i], solution) for i, solution in zip(failed, retry_solutions)
+            ])
+
+            for i, solution, is_correct in zip(failed, retry_solutions, retry_verdicts):
                 if not is_correct:
-                    return f"Could not generate a verified solution for step {i}: {step['task']}"
-            
-            complete_solution.append(f"Step {i}: {step['task']}\n{solution}\n")
+                    return f"Could not generate a verified solution for step {i + 1}: {steps[i]['task']}"
+                solutions[i] = solution
 
-        return "\n".join(complete_solution) 
\ No newline at end of file
+        complete_solution = [
+            f"Step {i}: {step['task']}\n{solution}\n"
+            for i, (step, solution) in enumerate(zip(steps, solutions), 1)
+        ]
+        return "\n".join(complete_solution)
+
+    # Failure messages are not cached so the next attempt calls the model again;
+    # verifiers with different models or prompt styles keep separate entries
+    @semantic_cache(
+        threshold=0.95,
+        namespace="solver",
+        cache_if=lambda result: not result.startswith("Could not"),
+        ttl=30 * 24 * 3600,
+        max_entries=1024,
+        key_attrs=("solver_model", "verifier_model", "terse_prompts")
+    )
+    def generate_solution_with_verification(self, query: str, stepwise: bool = False) -> str:
+        """
+        Generate and verify a complete solution for a math problem.
+
+        By default the whole pipeline runs as one structured-output call;
+        pass stepwise=True for the per-step breakdown/solve/verify calls.
+        """
+        return _run_sync(self._solve_and_close(query, stepwise))
+
+    async def _solve_and_close(self, query: str, stepwise: bool) -> str:
+        """Run the async pipeline, then release the client of the loop made for it."""
+        try:
+            return await self.agenerate_solution_with_verification(query, stepwise)
+        finally:
+            await aclose_async_openai_client()
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import threading
+import time
+
+# Account limits to stay under; defaults match a low OpenAI usage tier
+MAX_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_MAX_RPM", "500"))
+MAX_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_MAX_TPM", "30000"))
+
+class AsyncRateLimiter:
+    """
+    Token bucket limiting both requests and tokens per minute.
+
+    Callers reserve capacity up front and then sleep off any shortfall, so
+    requests are admitted in arrival order. The bucket is guarded by a thread
+    lock rather than an asyncio.Lock, so one limiter can be shared across
+    threads and event loops.
+    """
+
+    def __init__(self, rpm: float = MAX_REQUESTS_PER_MINUTE, tpm: float = MAX_TOKENS_PER_MINUTE):
+        self.rpm = rpm
+        self.tpm = tpm
+        # Both buckets start full and refill continuously
+        self.available_requests = rpm
+        self.available_tokens = tpm
+        self.last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        self.available_requests = min(self.rpm, self.available_requests + elapsed * self.rpm / 60)
+        self.available_tokens = min(self.tpm, self.available_tokens + elapsed * self.tpm / 60)
+
+    def _reserve(self, est_tokens: int) -> float:
+        """Take one request's capacity and return the seconds until it is covered."""
+        with self._lock:
+            self._refill()
+            self.available_requests -= 1
+            self.available_tokens -= est_tokens
+            # A negative balance is owed by the latest callers, who wait for it to refill
+            return max(
+                0.0,
+                -self.available_requests * 60 / self.rpm,
+                -self.available_tokens * 60 / self.tpm
+            )
+
+    async def acquire(self, est_tokens: int):
+        """Wait until one request using about est_tokens tokens fits within both limits."""
+        # A request larger than the whole bucket would otherwise wait forever
+        est_tokens = min(est_tokens, self.tpm)
+
+        wait = self._reserve(est_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
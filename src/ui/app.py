@@ -4,11 +4,12 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import os
 from dotenv import load_dotenv
-import time
-from typing import Dict
+from typing import Dict, Tuple
 import dspy
 
 openai_key = os.getenv("OPENAI_API_KEY")
@@ -31,31 +32,89 @@ if missing_keys:
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.validation.schema import MathQuery
-from src.knowledge_base.vectorstore import MathKnowledgeBase
-from src.web_search.searcher import MathWebSearcher
+from src.knowledge_base.vectorstore import get_knowledge_base
+from src.web_search.searcher import get_web_searcher
 from src.llm.solution_generator import MathSolutionGenerator
 from src.feedback.collector import FeedbackCollector, FeedbackCategory
 
+# Resources are shared across sessions so each server process loads them once
+@st.cache_resource(show_spinner=False)
+def get_kb():
+    return get_knowledge_base()
+
+@st.cache_resource(show_spinner=False)
+def get_searcher():
+    return get_web_searcher()
+
+@st.cache_resource(show_spinner=False)
+def get_solution_generator():
+    return MathSolutionGenerator()
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_collector():
+    return FeedbackCollector()
+
+@st.cache_resource(show_spinner=False)
+def get_lookup_pool():
+    # Runs the web lookup alongside the knowledge base search
+    return ThreadPoolExecutor(max_workers=8)
+
+def _normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace so trivially different questions share cache entries."""
+    return " ".join(question.lower().split())
+
+@st.cache_data(ttl=3600, max_entries=1024, show_spinner=False)
+def _kb_search(question: str):
+    """Knowledge base lookup, cached across sessions on the normalized question."""
+    return get_kb().search(question)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _solve(question: str) -> Tuple[str, bool]:
+    """Solve a question, returning the solution and whether web context was used."""
+    normalized = _normalize_question(question)
+
+    # Start the web search now so its latency overlaps the knowledge base lookup.
+    # The worker has no Streamlit script context, so it calls the searcher directly
+    # (which keeps its own result cache) rather than a st.cache_data function
+    web_future = get_lookup_pool().submit(get_searcher().search, normalized)
+
+    # Try knowledge base first, using its best match wherever it ranks
+    kb_results = _kb_search(normalized)
+    best = max(kb_results, key=lambda result: result.get("similarity_score", 0), default=None)
+    if best and best.get("similarity_score", 0) > 0.8:
+        # Drop the web search if it has not started; a running one is just ignored
+        web_future.cancel()
+        return best["solution"], False
+
+    # Fallback to web search and solution generation
+    context = web_future.result()
+    solution = get_solution_generator().generate(
+        query=question,
+        context=context
+    )
+    return solution, True
+
 def initialize_components():
     """Initialize components with status messages."""
     try:
-        # Initialize knowledge base
-        st.info("📚 Initializing knowledge base...")
-        with st.spinner("Loading Berkeley MATH dataset... This might take a minute or two."):
-            kb = MathKnowledgeBase()
-        
-        # Initialize other components
-        st.info("🌐 Setting up web search capabilities...")
-        web_searcher = MathWebSearcher()
-        
-        st.info("🧮 Initializing solution generator...")
-        solution_generator = MathSolutionGenerator()
-        
-        st.info("📝 Setting up feedback system...")
-        feedback_collector = FeedbackCollector()
-        
-        st.success("✅ Setup complete!")
-        time.sleep(1)  # Show completion message briefly
+        with st.status("Initializing...", expanded=True) as status:
+            # Initialize knowledge base
+            st.write("📚 Initializing knowledge base...")
+            with st.spinner("Loading Berkeley MATH dataset... This might take a minute or two."):
+                kb = get_kb()
+            
+            # Initialize other components
+            st.write("🌐 Setting up web search capabilities...")
+            web_searcher = get_searcher()
+            
+            st.write("🧮 Initializing solution generator...")
+            solution_generator = get_solution_generator()
+            
+            st.write("📝 Setting up feedback system...")
+            feedback_collector = get_feedback_collector()
+            
+            # Collapsing the status box replaces the old one-second pause
+            status.update(label="✅ Setup complete!", state="complete", expanded=False)
         
         return {
             "kb": kb,
@@ -80,6 +139,12 @@ def render_feedback_section(question: str, solution: str, context_used: bool) ->
     if 'feedback_submitted' not in st.session_state:
         st.session_state.feedback_submitted = False
     
+    # Widget key suffix unique per question, hashed once rather than on every rerun
+    if st.session_state.get('feedback_question') != question:
+        st.session_state.feedback_question = question
+        st.session_state.feedback_qkey = hashlib.blake2b(question.encode(), digest_size=8).hexdigest()
+    qkey = st.session_state.feedback_qkey
+    
     # Create columns for the 4Cs
     cols = st.columns(4)
     category_descriptions = {
@@ -101,7 +166,7 @@ def render_feedback_section(question: str, solution: str, context_used: bool) ->
             rating = st.slider(
                 f"{category.value} rating",
                 1, 5, default_rating,
-                key=f"rating_{category.value}_{question[:10]}"  # Make key unique per question
+                key=f"rating_{category.value}_{qkey}"
             )
             st.session_state.feedback_ratings[category] = rating
             
@@ -111,7 +176,7 @@ def render_feedback_section(question: str, solution: str, context_used: bool) ->
             feedback = st.text_area(
                 f"Specific feedback for {category.value}",
                 value=default_feedback,
-                key=f"feedback_{category.value}_{question[:10]}", # Make key unique per question
+                key=f"feedback_{category.value}_{qkey}",
                 height=100
             )
             if feedback:
@@ -119,7 +184,7 @@ def render_feedback_section(question: str, solution: str, context_used: bool) ->
     
     # Submit button
     if not st.session_state.feedback_submitted:
-        if st.button("Submit Feedback", key=f"submit_4c_feedback_{question[:10]}"):
+        if st.button("Submit Feedback", key=f"submit_4c_feedback_{qkey}"):
             # Submit feedback
             st.session_state.components["feedback_collector"].add_feedback(
                 question=question,
@@ -189,20 +254,8 @@ def main():
             query = MathQuery(query=question)
             
             with st.spinner("🧮 Solving your math problem..."):
-                # Try knowledge base first
-                kb_results = st.session_state.components["kb"].search(question)
-                
-                if kb_results and any(result.get("similarity_score", 0) > 0.8 for result in kb_results):
-                    solution = kb_results[0]["solution"]
-                    context_used = False
-                else:
-                    # Fallback to web search and solution generation
-                    context = st.session_state.components["web_searcher"].search(question)
-                    solution = st.session_state.components["solution_generator"].generate(
-                        query=question,
-                        context=context
-                    )
-                    context_used = True
+                # Repeat questions are answered from the cache without rerunning the pipeline
+                solution, context_used = _solve(question.strip())
                 
                 # Store in session state
                 st.session_state.current_solution = solution
@@ -1,6 +1,9 @@
 from pydantic import BaseModel, validator
 from typing import Optional
 
+ALLOWED_SUBJECTS = ("math", "phy", "chem")
+ALLOWED_TYPES = ("MCQ", "MCQ(multiple)", "Integer", "Numeric")
+
 class MathQuery(BaseModel):
     """Class to validate and structure math problem inputs."""
     
@@ -11,17 +14,15 @@ class MathQuery(BaseModel):
     @validator("subject")
     def validate_subject(cls, v):
         """Validate that subject is one of the allowed values."""
-        allowed_subjects = ["math", "phy", "chem"]
-        if v not in allowed_subjects:
-            raise ValueError(f"Subject must be one of {allowed_subjects}")
+        if v not in ALLOWED_SUBJECTS:
+            raise ValueError(f"Subject must be one of {list(ALLOWED_SUBJECTS)}")
         return v
     
     @validator("type")
     def validate_type(cls, v):
         """Validate that type is one of the allowed values."""
-        allowed_types = ["MCQ", "MCQ(multiple)", "Integer", "Numeric"]
-        if v not in allowed_types:
-            raise ValueError(f"Type must be one of {allowed_types}")
+        if v not in ALLOWED_TYPES:
+            raise ValueError(f"Type must be one of {list(ALLOWED_TYPES)}")
         return v
     
     @validator("question")
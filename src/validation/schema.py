@@ -1,37 +1,73 @@
+from typing import Tuple
 from pydantic import BaseModel, validator
 import re
 
+try:
+    import hyperscan  # Optional: scans every pattern in a single DFA pass
+except ImportError:
+    hyperscan = None
+
+# Math symbols and keywords to check for
+_MATH_PATTERNS = (
+    r'[\+\-\*/\^\(\)\[\]\{\}=<>≤≥≠∫∑∏√]',  # Math symbols
+    r'\b(solve|prove|calculate|find|integrate|differentiate|evaluate|simplify)\b',  # Math verbs
+    r'\b(equation|function|derivative|integral|limit|series|matrix|vector|polynomial)\b',  # Math nouns
+    r'\b(sin|cos|tan|log|ln|exp)\b',  # Math functions
+    r'\b(algebra|calculus|geometry|trigonometry|statistics|probability)\b',  # Math subjects
+    r'\b\d+\b',  # Numbers
+    r'\b[xyz]\b',  # Common variables
+    r'\b(pi|infinity|inf)\b'  # Math constants
+)
+
+# Non-math keywords to filter out
+_NONMATH_PATTERNS = (
+    r'\b(poem|story|essay|write|compose|create|generate)\b',
+    r'\b(song|music|lyrics|dance|paint|draw)\b',
+    r'\b(recipe|cook|bake|food|drink)\b',
+    r'\b(joke|funny|humor|comedy)\b'
+)
+
+# Each pattern set is fused into one alternation so a query is scanned once per set
+_MATH_RE = re.compile("|".join(f"(?:{p})" for p in _MATH_PATTERNS), re.IGNORECASE)
+_NONMATH_RE = re.compile("|".join(f"(?:{p})" for p in _NONMATH_PATTERNS), re.IGNORECASE)
+_SYMBOL_RE = re.compile(_MATH_PATTERNS[0])
+
+def _build_hyperscan_db():
+    """Compile both pattern sets into one Hyperscan database, or None if unavailable."""
+    if hyperscan is None:
+        return None
+    patterns = _MATH_PATTERNS + _NONMATH_PATTERNS
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[p.encode("utf-8") for p in patterns],
+        ids=list(range(len(patterns))),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SINGLEMATCH] * len(patterns)
+    )
+    return db
+
+_HS_DB = _build_hyperscan_db()
+
+def _scan_patterns(v: str) -> Tuple[bool, bool]:
+    """Return whether a query matches any math pattern and any non-math pattern."""
+    if _HS_DB is None:
+        return _MATH_RE.search(v) is not None, _NONMATH_RE.search(v) is not None
+
+    # Pattern ids below len(_MATH_PATTERNS) are math patterns, the rest non-math
+    matches = set()
+    _HS_DB.scan(v.encode("utf-8"), match_event_handler=lambda id, start, end, flags, context: matches.add(id))
+    return (
+        any(i < len(_MATH_PATTERNS) for i in matches),
+        any(i >= len(_MATH_PATTERNS) for i in matches)
+    )
+
 class MathQuery(BaseModel):
     """Schema for validating math-related queries."""
     query: str
 
     @validator('query')
     def validate_math_content(cls, v):
-        # Math symbols and keywords to check for
-        math_patterns = [
-            r'[\+\-\*/\^\(\)\[\]\{\}=<>≤≥≠∫∑∏√]',  # Math symbols
-            r'\b(solve|prove|calculate|find|integrate|differentiate|evaluate|simplify)\b',  # Math verbs
-            r'\b(equation|function|derivative|integral|limit|series|matrix|vector|polynomial)\b',  # Math nouns
-            r'\b(sin|cos|tan|log|ln|exp)\b',  # Math functions
-            r'\b(algebra|calculus|geometry|trigonometry|statistics|probability)\b',  # Math subjects
-            r'\b\d+\b',  # Numbers
-            r'\b[xyz]\b',  # Common variables
-            r'\b(pi|infinity|inf)\b'  # Math constants
-        ]
-        
-        # Check if query contains at least one math pattern
-        is_math_related = any(re.search(pattern, v.lower()) for pattern in math_patterns)
-        
-        # List of non-math keywords to filter out
-        non_math_keywords = [
-            r'\b(poem|story|essay|write|compose|create|generate)\b',
-            r'\b(song|music|lyrics|dance|paint|draw)\b',
-            r'\b(recipe|cook|bake|food|drink)\b',
-            r'\b(joke|funny|humor|comedy)\b'
-        ]
-        
-        # Check if query contains any non-math keywords
-        has_non_math = any(re.search(pattern, v.lower()) for pattern in non_math_keywords)
+        # Check for at least one math pattern and for any non-math keywords
+        is_math_related, has_non_math = _scan_patterns(v)
         
         if not is_math_related:
             raise ValueError("Query must contain mathematical terms, symbols, or concepts")
@@ -51,7 +87,7 @@ class MathQuery(BaseModel):
     def validate_complexity(cls, v):
         """Validate that the query isn't too complex or too simple."""
         # Count mathematical symbols and terms
-        math_symbols = len(re.findall(r'[\+\-\*/\^\(\)\[\]\{\}=<>≤≥≠∫∑∏√]', v))
+        math_symbols = len(_SYMBOL_RE.findall(v))
         
         # Very complex expressions might indicate copy-pasted content
         if math_symbols > 50:
@@ -0,0 +1,13 @@
+"""Shared Tavily clients for the web searchers."""
+from functools import lru_cache
+from tavily import TavilyClient
+
+@lru_cache(maxsize=4)
+def get_tavily_client(api_key: str) -> TavilyClient:
+    """
+    Return a shared Tavily client for the given API key.
+    
+    Searchers are often created per request, so caching the client per key
+    avoids rebuilding it and lets every searcher reuse the same connections.
+    """
+    return TavilyClient(api_key=api_key)
@@ -1,17 +1,38 @@
 from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 import os
-from openai import OpenAI
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from src.llm._client import get_openai_client
+from src.cache.semantic_cache import semantic_cache
 
 load_dotenv()
 
 class WebSearchVerifier:
     def __init__(self):
         """Initialize the web search verifier with API clients."""
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.openai_client = get_openai_client()
         self.tavily_api_key = os.getenv("TAVILY_API_KEY")
         self.serper_api_key = os.getenv("SERPER_API_KEY")
+        # One worker per search provider so both requests are in flight together
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+        # Keep-alive pool reused across searches; the search POSTs are idempotent,
+        # so transient 429/5xx responses are retried with backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=frozenset({"POST"})
+            )
+        )
+        self.session.mount("https://", adapter)
 
     def search_tavily(self, query: str) -> List[Dict]:
         """Search using Tavily API."""
@@ -26,10 +47,11 @@ class WebSearchVerifier:
             "max_results": 3
         }
         
-        response = requests.post(
+        response = self.session.post(
             "https://api.tavily.com/search",
             json=data,
-            headers=headers
+            headers=headers,
+            timeout=(3, 10)
         )
         
         if response.status_code == 200:
@@ -48,16 +70,26 @@ class WebSearchVerifier:
             "num": 3
         }
         
-        response = requests.post(
+        response = self.session.post(
             "https://google.serper.dev/search",
             json=data,
-            headers=headers
+            headers=headers,
+            timeout=(3, 10)
         )
         
         if response.status_code == 200:
             return response.json().get("organic", [])
         return []
 
+    @staticmethod
+    def _results_or_empty(future, provider: str) -> List[Dict]:
+        """Wait for a search future, treating a failed request as no results."""
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error searching {provider}: {e}")
+            return []
+
     def verify_sources(self, query: str, sources: List[Dict]) -> Dict:
         """Verify and compare multiple search results."""
         if not sources:
@@ -99,11 +131,23 @@ Sources:
             "reason": result.split(maxsplit=1)[1] if len(result.split(maxsplit=1)) > 1 else ""
         }
 
+    # Like plain searches, verified results go stale after an hour; a hit found
+    # for a similar query is reported under the query actually asked
+    @semantic_cache(
+        threshold=0.95,
+        namespace="web_verify",
+        cache_if=lambda result: bool(result["sources"]),
+        ttl=3600,
+        max_entries=512,
+        on_hit=lambda result, query: {**result, "query": query}
+    )
     def search_and_verify(self, query: str) -> Dict:
         """Perform web search with multi-source verification."""
-        # Get results from both search engines
-        tavily_results = self.search_tavily(query)
-        serper_results = self.search_serper(query)
+        # Query both search engines concurrently
+        tavily_future = self._executor.submit(self.search_tavily, query)
+        serper_future = self._executor.submit(self.search_serper, query)
+        tavily_results = self._results_or_empty(tavily_future, "Tavily")
+        serper_results = self._results_or_empty(serper_future, "Serper")
         
         # Combine and verify results
         all_results = tavily_results + serper_results
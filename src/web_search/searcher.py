@@ -1,12 +1,18 @@
 from typing import List, Dict
-from tavily import TavilyClient
+from functools import lru_cache
+import asyncio
+import re
 from bs4 import BeautifulSoup
 import requests
 from dotenv import load_dotenv
 import os
+from src.cache.semantic_cache import semantic_cache
+from src.web_search._client import get_tavily_client
 
 load_dotenv()
 
+_WS_RE = re.compile(r"\s+")
+
 class MathWebSearcher:
     def __init__(self):
         """Initialize the web searcher with Tavily API."""
@@ -14,8 +20,10 @@ class MathWebSearcher:
         api_key = os.getenv("TAVILY_API_KEY") or os.getenv("TAVILY_AI_KEY")
         if not api_key:
             raise ValueError("Neither TAVILY_API_KEY nor TAVILY_AI_KEY environment variable found")
-        self.client = TavilyClient(api_key=api_key)
+        self.client = get_tavily_client(api_key)
 
+    # Search results go stale, so entries expire after an hour
+    @semantic_cache(threshold=0.95, namespace="web", ttl=3600, max_entries=512)
     def search(self, query: str, max_results: int = 3) -> List[Dict]:
         """
         Search for math-related content using Tavily API.
@@ -45,14 +53,8 @@ class MathWebSearcher:
 
     def _clean_content(self, content: str) -> str:
         """Clean and format the extracted content."""
-        # Remove extra whitespace and normalize text
-        content = ' '.join(content.split())
-        
-        # Basic cleaning
-        content = content.replace('\n', ' ').replace('\t', ' ')
-        content = ' '.join(line.strip() for line in content.split('\n') if line.strip())
-        
-        return content
+        # Collapse every whitespace run (newlines, tabs, spaces) in one pass
+        return _WS_RE.sub(' ', content).strip()
 
     def get_context(self, query: str) -> str:
         """Get combined context from web search results."""
@@ -66,4 +68,21 @@ class MathWebSearcher:
             for result in results
         )
         
-        return combined_context 
\ No newline at end of file
+        return combined_context 
+
+    def clear_cache(self):
+        """Drop all cached search results."""
+        MathWebSearcher.search.cache.clear()
+
+    async def asearch(self, query: str, max_results: int = 3) -> List[Dict]:
+        """Async variant of search that runs the Tavily request in a worker thread."""
+        return await asyncio.to_thread(self.search, query, max_results)
+
+    async def aget_context(self, query: str) -> str:
+        """Async variant of get_context."""
+        return await asyncio.to_thread(self.get_context, query)
+
+@lru_cache(maxsize=None)
+def get_web_searcher() -> MathWebSearcher:
+    """Return the process-wide web searcher."""
+    return MathWebSearcher()
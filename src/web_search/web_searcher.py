@@ -1,8 +1,81 @@
 import os
+import sys
 from typing import List, Dict, Any
-from tavily import TavilyClient
+from functools import lru_cache
+import asyncio
+import threading
+from cachetools import TTLCache
+from src.web_search._client import get_tavily_client
 import re
 
+# Distinctive math terms, found with plain substring checks against the lowercased query
+_LITERAL_TERMS = (
+    "trigonometric", "quadratic", "equation", "polynomial", "matrix", "determinant",
+    "dot product", "cross product", "probability", "statistics", "geometry", "triangle",
+    "polygon", "logarithm", "exponential", "complex number", "imaginary", "sequence",
+    "progression"
+)
+
+# Short math terms that also occur inside ordinary words, so only whole words count
+# ("since" is not sin, "cost" is not cos, "model" is not mode)
+_WORD_TERMS = (
+    "sin", "cos", "tan", "sec", "cosec", "cot", "root", "inverse", "derivative", "integral",
+    "calculus", "vector", "scalar", "mean", "median", "mode", "circle", "square", "power",
+    "real", "series"
+)
+_PLURAL_TERMS = (
+    "root", "inverse", "derivative", "integral", "vector", "scalar", "median", "mode",
+    "circle", "square", "power"
+)
+# Every accepted word form mapped to its base term, so "roots" and "tangent" still count
+_WORD_TERM_FORMS = {
+    **{term: term for term in _WORD_TERMS},
+    **{term + "s": term for term in _PLURAL_TERMS},
+    "sine": "sin", "sines": "sin", "cosine": "cos", "cosines": "cos",
+    "tangent": "tan", "tangents": "tan", "secant": "sec", "cosecant": "cosec",
+    "cotangent": "cot", "squared": "square"
+}
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+# Numbers and mathematical symbols; the possessive ++ (Python 3.11+) keeps no backtracking state
+_MATH_SYMBOLS_RE = re.compile(
+    r'[\+\-\*/\^=<>≤≥≠∫∑∏√]++' if sys.version_info >= (3, 11) else r'[\+\-\*/\^=<>≤≥≠∫∑∏√]+'
+)
+_SYMBOLS = frozenset("+-*/^=<>≤≥≠∫∑∏√")
+
+# Formatted Tavily results keyed on (enhanced query, max_results), expiring after an hour
+_SEARCH_CACHE = TTLCache(maxsize=512, ttl=3600)
+_SEARCH_CACHE_LOCK = threading.Lock()
+
+# Queries shorter than this are already terse enough to search as-is
+MIN_EXPAND_LENGTH = 20
+# Only the start of very long queries is scanned for concepts
+MAX_SCAN_LENGTH = 1024
+
+@lru_cache(maxsize=2048)
+def extract_math_concepts(query: str) -> str:
+    """Extract key math concepts from the query."""
+    if len(query) < MIN_EXPAND_LENGTH:
+        return query
+    
+    # Find all math terms, then numbers and mathematical symbols
+    scanned = query[:MAX_SCAN_LENGTH]
+    q = scanned.lower()
+    found_terms = {term for term in _LITERAL_TERMS if term in q}
+    # Whole-word terms come from one set intersection over the query's tokens
+    found_terms.update(_WORD_TERM_FORMS[form] for form in _WORD_TERM_FORMS.keys() & _TOKEN_RE.findall(q))
+    # Most queries are plain words; skip the symbol scan when no symbol char is present
+    if not _SYMBOLS.isdisjoint(scanned):
+        found_terms.update(_MATH_SYMBOLS_RE.findall(scanned))
+    
+    # If no terms found, take the first 50 characters
+    if not found_terms:
+        return query[:50]
+    
+    # Combine terms into a search query
+    search_terms = " ".join(found_terms)
+    return f"math problem {search_terms}"
+
 class WebSearcher:
     """Class to search for math-related information on the web using Tavily API."""
     
@@ -11,41 +84,11 @@ class WebSearcher:
         self.api_key = os.getenv("TAVILY_AI_KEY")
         if not self.api_key:
             raise ValueError("Tavily API key not found. Please set TAVILY_AI_KEY environment variable.")
-        self.client = TavilyClient(api_key=self.api_key)
+        self.client = get_tavily_client(self.api_key)
     
     def extract_math_concepts(self, query: str) -> str:
         """Extract key math concepts from the query."""
-        # Common math terms to look for
-        math_terms = [
-            r"trigonometric|sin|cos|tan|sec|cosec|cot",
-            r"quadratic|equation|root|polynomial",
-            r"matrix|determinant|inverse",
-            r"derivative|integral|calculus",
-            r"vector|scalar|dot product|cross product",
-            r"probability|statistics|mean|median|mode",
-            r"geometry|circle|triangle|square|polygon",
-            r"logarithm|exponential|power",
-            r"complex number|imaginary|real",
-            r"series|sequence|progression"
-        ]
-        
-        # Find all math terms in the query
-        found_terms = set()
-        for pattern in math_terms:
-            matches = re.findall(pattern, query.lower())
-            found_terms.update(matches)
-        
-        # Extract numbers and mathematical symbols
-        math_symbols = re.findall(r'[\+\-\*/\^=<>≤≥≠∫∑∏√]+', query)
-        found_terms.update(math_symbols)
-        
-        # If no terms found, take the first 50 characters
-        if not found_terms:
-            return query[:50]
-        
-        # Combine terms into a search query
-        search_terms = " ".join(found_terms)
-        return f"math problem {search_terms}"
+        return extract_math_concepts(query)
     
     def search(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
@@ -60,7 +103,14 @@ class WebSearcher:
         """
         try:
             # Extract key math concepts for shorter query
-            enhanced_query = self.extract_math_concepts(query)
+            enhanced_query = extract_math_concepts(query)
+            
+            # Repeated searches skip the network round-trip; copies keep the cached entry intact
+            cache_key = (enhanced_query, max_results)
+            with _SEARCH_CACHE_LOCK:
+                cached = _SEARCH_CACHE.get(cache_key)
+            if cached is not None:
+                return [dict(result) for result in cached]
             
             # Perform search
             response = self.client.search(
@@ -69,18 +119,26 @@ class WebSearcher:
                 max_results=max_results
             )
             
-            # Format results
-            results = []
-            for result in response.get("results", []):
-                results.append({
+            # Format results in a single pass over the raw Tavily list
+            raw_results = response.get("results", [])
+            results = [
+                {
                     "title": result.get("title", ""),
                     "content": result.get("content", ""),
                     "url": result.get("url", ""),
                     "score": result.get("score", 0)
-                })
+                }
+                for result in raw_results
+            ]
             
+            with _SEARCH_CACHE_LOCK:
+                _SEARCH_CACHE[cache_key] = tuple(dict(result) for result in results)
             return results
             
         except Exception as e:
             print(f"Error performing web search: {str(e)}")
-            return [] 
\ No newline at end of file
+            return [] 
+    
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        """Async variant of search that runs the Tavily request in a worker thread."""
+        return await asyncio.to_thread(self.search, query, max_results)
@@ -1,8 +1,14 @@
+from functools import lru_cache
 from src.validation.schema import MathQuery
-from src.knowledge_base.vectorstore import MathKnowledgeBase
+from src.knowledge_base.vectorstore import get_knowledge_base
 from src.mcp.solution_verifier import MCPSolutionVerifier
 from src.feedback.collector import FeedbackCollector
 
+@lru_cache(maxsize=1)
+def _get_feedback_collector() -> FeedbackCollector:
+    """Create the feedback collector once and reuse it across queries."""
+    return FeedbackCollector()
+
 def process_math_query(query: str, force_mcp: bool = False):
     """Process a math query through the entire pipeline."""
     print(f"\n🔍 Processing query: {query}\n")
@@ -16,8 +22,7 @@ def process_math_query(query: str, force_mcp: bool = False):
         return
 
     # 2. Check knowledge base first (using MATH dataset)
-    kb = MathKnowledgeBase()
-    kb.load_data()  # This will load the MATH dataset from Hugging Face
+    kb = get_knowledge_base()  # Loads the MATH dataset on first use, then reuses it
     kb_results = kb.search(query)
     
     # First try knowledge base if not forcing MCP
@@ -28,7 +33,7 @@ def process_math_query(query: str, force_mcp: bool = False):
         print("\nCategory:", kb_results[0]['category'])
         
         # Collect feedback
-        feedback = FeedbackCollector()
+        feedback = _get_feedback_collector()
         feedback.collect(query, kb_results[0]['solution'])
         return
 
@@ -44,7 +49,7 @@ def process_math_query(query: str, force_mcp: bool = False):
         print(solution)
         
         # Collect feedback
-        feedback = FeedbackCollector()
+        feedback = _get_feedback_collector()
         feedback.collect(query, solution)
 
 if __name__ == "__main__":
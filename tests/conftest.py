@@ -0,0 +1,53 @@
+"""Shared fixtures for the test suite."""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+# Components load models, datasets and API clients, so each is built once per
+# session. Imports are deferred so a test only needs the components it uses.
+
+@pytest.fixture(scope="session", autouse=True)
+def semantic_cache_dir(tmp_path_factory):
+    """Keep semantic-cache logs in a fresh directory so earlier runs cannot affect results."""
+    with pytest.MonkeyPatch.context() as mp:
+        path = tmp_path_factory.mktemp("mathrag_cache")
+        mp.setenv("MATHRAG_CACHE_DIR", str(path))
+        yield path
+
+@pytest.fixture(scope="session")
+def kb():
+    """Process-wide knowledge base, built from the MATH dataset on first use."""
+    from src.knowledge_base.vectorstore import get_knowledge_base
+    return get_knowledge_base()
+
+@pytest.fixture(scope="session")
+def searcher():
+    """Process-wide Tavily-backed web searcher."""
+    from src.web_search.searcher import get_web_searcher
+    return get_web_searcher()
+
+@pytest.fixture(scope="session")
+def generator():
+    """Solution generator with its refiner, knowledge base and web searcher."""
+    from src.llm.solution_generator import MathSolutionGenerator
+    return MathSolutionGenerator()
+
+@pytest.fixture(scope="session")
+def collector():
+    """Feedback collector used by the UI."""
+    from src.feedback.collector import FeedbackCollector
+    return FeedbackCollector()
+
+@pytest.fixture(scope="session")
+def feedback_manager():
+    """Feedback manager writing to a test history file."""
+    from src.feedback.feedback_manager import FeedbackManager
+    return FeedbackManager("test_feedback_history.json")
+
+@pytest.fixture(scope="session")
+def feedback_loop():
+    """Feedback loop manager used for solution refinement."""
+    from src.feedback.feedback_loop import FeedbackManager as FeedbackLoopManager
+    return FeedbackLoopManager()
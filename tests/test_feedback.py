@@ -17,11 +17,8 @@ openai.api_key = api_key
 lm = dspy.LM("openai/gpt-4", api_key=api_key)
 dspy.settings.configure(lm=lm)
 
-def test_feedback_collection():
+def test_feedback_collection(feedback_manager):
     """Test the basic feedback collection functionality."""
-    # Initialize feedback manager with a test file
-    feedback_manager = FeedbackManager("test_feedback_history.json")
-    
     # Sample math problem and solution
     test_problem = "Solve the quadratic equation: x² + 5x + 6 = 0"
     test_solution = {
@@ -55,10 +52,8 @@ def test_feedback_collection():
         for criteria, rating in stats['average_ratings'].items():
             print(f"- {criteria}: {rating:.2f}")
 
-def test_feedback_refinement():
+def test_feedback_refinement(feedback_loop):
     """Test the feedback-based solution refinement."""
-    feedback_loop = FeedbackLoopManager()
-    
     # Sample problem and initial solution
     question = "Find the derivative of f(x) = x³ + 2x² - 4x + 1"
     solution = {
@@ -90,6 +85,6 @@ def test_feedback_refinement():
 
 if __name__ == "__main__":
     print("Starting feedback system tests...")
-    test_feedback_collection()
-    test_feedback_refinement()
+    test_feedback_collection(FeedbackManager("test_feedback_history.json"))
+    test_feedback_refinement(FeedbackLoopManager())
     print("\nTests completed!") 
\ No newline at end of file
@@ -2,10 +2,22 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import argparse
 import json
+import logging
+import re
+import asyncio
+import shutil
+import tempfile
+import urllib.request
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import dspy
 from src.feedback.feedback_manager import FeedbackManager
 from src.llm.solution_generator import SolutionGenerator
+from src.llm._client import aclose_async_openai_client
 from src.knowledge_base.vector_store import KnowledgeBase
 from src.web_search.web_searcher import WebSearcher
 from src.validation.input_validator import MathQuery
@@ -15,19 +27,44 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Per-question evaluation details are logged at DEBUG, shown with --verbose
+logger = logging.getLogger(__name__)
+
 # Debug prints
 print("Environment variables check:")
 print("TAVILY_AI_KEY present:", "Yes" if os.getenv("TAVILY_AI_KEY") else "No")
 print("OPENAI_API_KEY present:", "Yes" if os.getenv("OPENAI_API_KEY") else "No")
 
+# Common answer patterns, compiled once and tried in order
+_ANSWER_PATTERNS = [re.compile(p) for p in (
+    r"therefore,?\s*the\s*answer\s*is\s*\(?([A-Da-d])\)?",
+    r"the\s*answer\s*is\s*\(?([A-Da-d])\)?",
+    r"final\s*answer\s*is\s*\(?([A-Da-d])\)?",
+    r"answer:\s*\(?([A-Da-d])\)?",
+    r"([A-Da-d])\s*is\s*the\s*correct\s*answer",
+)]
+_LETTER_RE = re.compile(r'[A-Da-d]')
+_NUMBER_RE = re.compile(r'-?\d*\.?\d+')
+_NON_ALPHA_RE = re.compile(r'[^A-Za-z]')
+
+# Question types whose answers are option letters or numbers
+_MCQ_TYPES = frozenset(("MCQ", "MCQ(multiple)"))
+_NUMERIC_TYPES = frozenset(("Integer", "Numeric"))
+
+JEE_DATASET_URL = "https://github.com/dair-iitd/jeebench/raw/main/data.zip"
+JEE_DATASET_PATH = Path("data/dataset.json")
+
 def load_jee_dataset():
     """Load JEE benchmark dataset."""
-    # Download and unzip the dataset
-    os.system("wget -q https://github.com/dair-iitd/jeebench/raw/main/data.zip")  # Added -q for quiet download
-    os.system("yes | unzip -o data.zip")  # Added yes and -o to automatically overwrite
+    # Download and unzip the dataset only if it isn't already on disk
+    if not JEE_DATASET_PATH.exists():
+        with urllib.request.urlopen(JEE_DATASET_URL) as response, tempfile.TemporaryFile() as archive:
+            shutil.copyfileobj(response, archive)
+            with zipfile.ZipFile(archive) as zf:
+                zf.extractall(".")
     
     # Load the dataset
-    with open("data/dataset.json", "r") as f:
+    with JEE_DATASET_PATH.open("r") as f:
         dataset = json.load(f)
     return dataset
 
@@ -36,17 +73,8 @@ def extract_answer_from_text(text: str) -> str:
     text = text.lower()
     
     # Look for common answer patterns
-    patterns = [
-        r"therefore,?\s*the\s*answer\s*is\s*\(?([A-Da-d])\)?",
-        r"the\s*answer\s*is\s*\(?([A-Da-d])\)?",
-        r"final\s*answer\s*is\s*\(?([A-Da-d])\)?",
-        r"answer:\s*\(?([A-Da-d])\)?",
-        r"([A-Da-d])\s*is\s*the\s*correct\s*answer",
-    ]
-    
-    import re
-    for pattern in patterns:
-        match = re.search(pattern, text)
+    for pattern in _ANSWER_PATTERNS:
+        match = pattern.search(text)
         if match:
             return match.group(1).upper()
     
@@ -55,7 +83,7 @@ def extract_answer_from_text(text: str) -> str:
     if lines:
         last_line = lines[-1]
         # Extract any single letter A-D from the last line
-        letters = re.findall(r'[A-Da-d]', last_line)
+        letters = _LETTER_RE.findall(last_line)
         if letters:
             return letters[-1].upper()
     
@@ -66,25 +94,58 @@ def clean_answer(answer: str, question_type: str) -> str:
     if not answer:
         return ""
         
-    answer = str(answer).strip()
+    # Answers almost always arrive as strings already
+    if not isinstance(answer, str):
+        answer = str(answer)
+    answer = answer.strip()
     
-    if question_type in ["MCQ", "MCQ(multiple)"]:
+    if question_type in _MCQ_TYPES:
         # First try to extract answer from text if it's a longer response
         if len(answer) > 5:  # If it's more than just a letter or two
             answer = extract_answer_from_text(answer)
         # Extract only letters and convert to uppercase
-        cleaned = ''.join(c for c in answer if c.isalpha())
-        return cleaned.upper()
-    elif question_type in ["Integer", "Numeric"]:
+        return _NON_ALPHA_RE.sub('', answer).upper()
+    elif question_type in _NUMERIC_TYPES:
         # Extract numbers, decimal points, and negative signs
-        # First, find any number in the text (including decimals and negatives)
-        import re
-        numbers = re.findall(r'-?\d*\.?\d+', answer)
-        if numbers:
-            return numbers[0]  # Return the first number found
-        return ""
+        # Return the first number in the text (including decimals and negatives)
+        match = _NUMBER_RE.search(answer)
+        return match.group(0) if match else ""
     return answer
 
+# In-flight solve requests during evaluation; ~50 stays under a 500 RPM limit
+MAX_CONCURRENT_SOLVES = 50
+
+async def solve_all(model, math_problems, max_concurrency=MAX_CONCURRENT_SOLVES, on_solved=None):
+    """
+    Solve every problem concurrently, returning solutions in problem order.
+    
+    on_solved(index, question, solution), if given, is called as each solve
+    finishes, in completion order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    progress = tqdm(total=len(math_problems), desc="Math Questions")
+    
+    async def solve_one(index, question):
+        # Prepare input
+        query = MathQuery(
+            question=question["question"],
+            subject="math",
+            type=question["type"]
+        )
+        async with semaphore:
+            solution = await model.asolve(query)
+        progress.update(1)
+        if on_solved is not None:
+            on_solved(index, question, solution)
+        return solution
+    
+    # gather preserves problem order in the results
+    try:
+        return await asyncio.gather(*(solve_one(i, question) for i, question in enumerate(math_problems)))
+    finally:
+        progress.close()
+        await aclose_async_openai_client()
+
 def evaluate_model(dataset, model):
     """Evaluate model on JEE benchmark dataset."""
     # Filter for math problems only
@@ -105,28 +166,12 @@ def evaluate_model(dataset, model):
     print(f"\nStarting evaluation on {total_questions} JEE math questions...")
     
     print("\nProgress by type:")
+    type_counts = Counter(q["type"] for q in math_problems)
     for qtype in ["MCQ", "MCQ(multiple)", "Integer", "Numeric"]:
-        type_count = len([q for q in math_problems if q["type"] == qtype])
-        print(f"{qtype}: {type_count} questions")
+        print(f"{qtype}: {type_counts[qtype]} questions")
     
-    print("\nProcessing questions...")
-    for i, question in enumerate(tqdm(math_problems, desc="Math Questions")):
-        # Print detailed progress every 5 questions
-        if i % 5 == 0:
-            print(f"\nQuestion {i+1}/{total_questions}")
-            print(f"Type: {question['type']}")
-            print("Current accuracy:", f"{(results['correct']/results['total']*100):.2f}%" if results['total'] > 0 else "N/A")
-        
-        # Prepare input
-        query = MathQuery(
-            question=question["question"],
-            subject="math",
-            type=question["type"]
-        )
-        
-        # Generate solution
-        solution = model.solve(query)
-        
+    def score(i, question, solution):
+        """Score one solution as soon as it arrives."""
         # Clean and compare answers
         predicted_answer = clean_answer(solution.get("answer", ""), question["type"])
         correct_answer = clean_answer(question["gold"], question["type"])
@@ -140,16 +185,26 @@ def evaluate_model(dataset, model):
             results["correct"] += 1
             results["type_wise"][question["type"]]["correct"] += 1
             
-        # Print result for this question
-        print(f"\nQuestion {i+1} Result:")
-        print(f"Question type: {question['type']}")
-        print(f"Raw predicted: {solution.get('answer', '')}")
-        print(f"Cleaned predicted: {predicted_answer}")
-        print(f"Raw correct: {question['gold']}")
-        print(f"Cleaned correct: {correct_answer}")
-        print(f"Status: {'✓' if is_correct else '✗'}")
+        # Log result for this question
+        logger.debug(
+            "\nQuestion %d Result:\nQuestion type: %s\nRaw predicted: %s\nCleaned predicted: %s\n"
+            "Raw correct: %s\nCleaned correct: %s\nStatus: %s",
+            i + 1, question['type'], solution.get('answer', ''), predicted_answer,
+            question['gold'], correct_answer, '✓' if is_correct else '✗'
+        )
         if not is_correct:
-            print("Full solution:", solution.get("solution", ""))
+            logger.debug("Full solution: %s", solution.get("solution", ""))
+        
+        # Log the running accuracy every 5 scored questions
+        if results["total"] % 5 == 0:
+            logger.debug(
+                "\nScored %d/%d questions\nCurrent accuracy: %.2f%%",
+                results["total"], total_questions, results["correct"] / results["total"] * 100
+            )
+    
+    # Solutions are scored while the remaining solves are still in flight
+    print("\nProcessing questions...")
+    asyncio.run(solve_all(model, math_problems, on_solved=score))
     
     # Calculate accuracies
     results["accuracy"] = results["correct"] / results["total"] if results["total"] > 0 else 0
@@ -172,12 +227,11 @@ def print_results(results):
 def test_single_problem(dataset, model):
     """Test the model on a single math problem."""
     # Find the first math problem
-    math_problems = [q for q in dataset if q["subject"] == "math"]
-    if not math_problems:
+    question = next((q for q in dataset if q["subject"] == "math"), None)
+    if question is None:
         print("No math problems found in dataset!")
         return
     
-    question = math_problems[0]
     print("\n=== Testing Single Math Problem ===")
     print(f"\nQuestion Type: {question['type']}")
     print(f"Question Text: {question['question']}")
@@ -227,27 +281,32 @@ def test_sample_problems(dataset, model, samples_per_type=3):
     
     print("\n=== Testing Sample Problems ===")
     
-    # Test problems for each type
+    # Take first 3 problems of each type
+    test_problems = [problem for problems in problems_by_type.values() for problem in problems[:samples_per_type]]
+    
+    # Generate all solutions concurrently; solve is dominated by HTTP waits
+    print("\nGenerating solutions...")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        solutions = list(executor.map(
+            lambda question: model.solve(MathQuery(
+                question=question["question"],
+                subject="math",
+                type=question["type"]
+            )),
+            test_problems
+        ))
+    solution_iter = iter(solutions)
+    
+    # Report results for each type
     for qtype, problems in problems_by_type.items():
         print(f"\n--- Testing {qtype} Problems ---")
-        # Take first 3 problems of each type
-        test_problems = problems[:samples_per_type]
         
-        for i, question in enumerate(test_problems, 1):
+        for i, question in enumerate(problems[:samples_per_type], 1):
             print(f"\nProblem {i} of {samples_per_type}")
             print(f"Question: {question['question']}")
             print(f"Expected Answer: {question['gold']}")
             
-            # Prepare input
-            query = MathQuery(
-                question=question["question"],
-                subject="math",
-                type=question["type"]
-            )
-            
-            # Generate solution
-            print("\nGenerating solution...")
-            solution = model.solve(query)
+            solution = next(solution_iter)
             
             # Clean and compare answers
             predicted_answer = clean_answer(solution.get("answer", ""), question["type"])
@@ -282,4 +341,8 @@ def main():
     test_sample_problems(dataset, solution_generator)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the JEE math benchmark.")
+    parser.add_argument("--verbose", action="store_true", help="Log the result of every question")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
     main() 
\ No newline at end of file
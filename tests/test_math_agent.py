@@ -1,4 +1,15 @@
- e 2x + 3 = 7",
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.validation.schema import MathQuery
+
+def test_query_validation():
+    """Test query validation."""
+    # Valid queries
+    valid_queries = [
+        "Solve the equation 2x + 3 = 7",
         "Calculate the integral of sin(x)"
     ]
     
@@ -16,28 +27,23 @@
         with pytest.raises(ValueError):
             MathQuery(query=query)
 
-def test_knowledge_base():
+def test_knowledge_base(kb):
     """Test knowledge base retrieval."""
-    kb = MathKnowledgeBase()
-    kb.load_data("data/math_qa.json")
-    
     # Test search
     results = kb.search("Find the derivative of x^2")
     assert len(results) > 0
     assert "derivative" in results[0]["question"].lower()
     assert isinstance(results[0]["similarity_score"], float)
 
-def test_web_search():
+def test_web_search(searcher):
     """Test web search functionality."""
-    searcher = MathWebSearcher()
     results = searcher.search("calculus integration by parts formula")
     assert len(results) > 0
     assert isinstance(results[0]["title"], str)
     assert isinstance(results[0]["content"], str)
 
-def test_solution_generation():
+def test_solution_generation(generator):
     """Test solution generation."""
-    generator = MathSolutionGenerator()
     solution = generator.generate(
         "Find the derivative of x^2",
         context="The derivative of x^n is nx^(n-1)"
@@ -45,9 +51,8 @@ def test_solution_generation():
     assert solution
     assert "2x" in solution.lower()
 
-def test_feedback_collection():
+def test_feedback_collection(collector):
     """Test feedback collection."""
-    collector = FeedbackCollector()
     feedback = collector.add_feedback(
         question="What is 2+2?",
         solution="4",
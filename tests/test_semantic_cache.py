@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import types
+import numpy as np
+import pytest
+from src.cache import semantic_cache as sc
+from src.cache.semantic_cache import SemanticCache, semantic_cache
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch, tmp_path):
+    """Embed queries as unit bag-of-words vectors and keep cache files in tmp_path."""
+    vocabulary = {}
+
+    def embed_query(model_name, query):
+        vector = np.zeros(256, dtype=np.float32)
+        for word in query.split():
+            vector[vocabulary.setdefault(word, len(vocabulary))] += 1
+        return vector / np.linalg.norm(vector)
+
+    monkeypatch.setattr(sc, "embed_query", embed_query)
+    monkeypatch.setenv("MATHRAG_CACHE_DIR", str(tmp_path))
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable replacement for time.time inside the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(sc, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def test_exact_hit_ignores_case_and_whitespace():
+    cache = SemanticCache("exact")
+    cache.set("Solve 2x + 3 = 7", "x = 2")
+    assert cache.get("  solve 2x +   3 = 7 ") == "x = 2"
+    assert cache.get("Solve 2x + 3 = 7", context="other") is None
+
+def test_semantic_hit_respects_threshold():
+    # The paraphrase shares 6 of its 7 words, a cosine similarity of about 0.93
+    cache = SemanticCache("semantic", threshold=0.9)
+    cache.set("solve 2x + 3 = 7", "x = 2")
+    assert cache.get("please solve 2x + 3 = 7") == "x = 2"
+
+    strict = SemanticCache("strict", threshold=0.95)
+    strict.set("solve 2x + 3 = 7", "x = 2")
+    assert strict.get("please solve 2x + 3 = 7") is None
+
+def test_signature_mismatch_refuses_semantic_hit():
+    # Similar enough to pass the threshold, but the constant differs
+    cache = SemanticCache("signature", threshold=0.8)
+    cache.set("solve 2x + 3 = 7", "x = 2")
+    assert cache.get("solve 2x + 3 = 9") is None
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticCache("ttl", threshold=0.9, ttl=60)
+    cache.set("solve 2x + 3 = 7", "x = 2")
+    clock[0] += 30
+    assert cache.get("solve 2x + 3 = 7") == "x = 2"
+    clock[0] += 31
+    assert cache.get("solve 2x + 3 = 7") is None
+    assert cache.get("please solve 2x + 3 = 7") is None
+
+def test_oldest_entries_are_evicted_from_both_tiers():
+    cache = SemanticCache("evict", threshold=0.9, max_entries=2)
+    cache.set("solve 2x + 3 = 7", "first", context="a")
+    cache.set("solve 5y - 1 = 4", "second", context="b")
+    cache.set("solve 3z = 12", "third", context="a")
+    assert cache.get("solve 2x + 3 = 7", context="a") is None
+    assert cache.get("please solve 2x + 3 = 7", context="a") is None
+    assert cache.get("solve 5y - 1 = 4", context="b") == "second"
+    assert cache.get("solve 3z = 12", context="a") == "third"
+
+def test_setting_a_query_again_replaces_its_entry():
+    cache = SemanticCache("replace", threshold=0.9)
+    cache.set("solve 2x + 3 = 7", "old")
+    cache.set("solve 2x + 3 = 7", "new")
+    assert cache.get("please solve 2x + 3 = 7") == "new"
+    keys, matrix = cache._matrix("")
+    assert len(keys) == len(matrix) == 1
+
+def test_entries_are_replayed_after_restart():
+    cache = SemanticCache("replay", threshold=0.9)
+    cache.set("solve 2x + 3 = 7", {"answer": "x = 2", "steps": ["subtract 3", "divide by 2"]})
+    cache.set("solve 3z = 12", "z = 4", context="ctx")
+
+    restarted = SemanticCache("replay", threshold=0.9)
+    assert restarted.get("solve 2x + 3 = 7") == {"answer": "x = 2", "steps": ["subtract 3", "divide by 2"]}
+    assert restarted.get("please solve 2x + 3 = 7")["answer"] == "x = 2"
+    assert restarted.get("solve 3z = 12", context="ctx") == "z = 4"
+
+def test_log_is_compacted_and_skips_unreadable_lines():
+    cache = SemanticCache("compact", max_entries=4)
+    for i in range(100):
+        cache.set(f"solve x + {i} = 0", f"x = -{i}")
+    with open(cache.path, "rb") as f:
+        assert len(f.readlines()) <= 2 * 4 + 17
+    with open(cache.path, "ab") as f:
+        f.write(b"not json\n")
+
+    restarted = SemanticCache("compact", max_entries=4)
+    assert restarted.get("solve x + 99 = 0") == "x = -99"
+    assert restarted.get("solve x + 0 = 0") is None
+
+def test_decorator_keys_on_instance_config_and_rewrites_hits():
+    calls = []
+
+    class Solver:
+        def __init__(self, model):
+            self.model = model
+
+        @semantic_cache(
+            threshold=0.9,
+            namespace="decorated",
+            key_attrs=("model",),
+            on_hit=lambda result, query: {**result, "query": query}
+        )
+        def solve(self, query):
+            calls.append(self.model)
+            return {"query": query, "model": self.model}
+
+    assert Solver("a").solve("solve 2x + 3 = 7") == {"query": "solve 2x + 3 = 7", "model": "a"}
+    assert Solver("b").solve("solve 2x + 3 = 7")["model"] == "b"
+    assert Solver("a").solve("please solve 2x + 3 = 7") == {"query": "please solve 2x + 3 = 7", "model": "a"}
+    assert calls == ["a", "b"]